@@ -15,12 +15,8 @@ import time
 import datetime
 import argparse
 import yaml
-import numa
 import re
 import json
-import numpy as np
-import matplotlib.pyplot as plt
-from collections import Counter
 from colorama import Fore, Back, Style
 sys.path.insert(0, 'scripts')
 from backends import *
@@ -53,7 +49,7 @@ def parse_experiment_yml(configs):
         for setting in configs["experiments"][experiment]:
             if setting == "numa-node-configs":
                 for node in configs["experiments"][experiment][setting]:
-                    if int(configs["experiments"][experiment][setting][node]) > numa.info.get_max_node():
+                    if int(configs["experiments"][experiment][setting][node]) > host_info().max_node():
                         print_error(node + " value not in range of available NUMA nodes"); parse_errors += 1
             elif setting == "paths":
                 output_directory = configs["experiments"][experiment][setting]["output-directory"]
@@ -150,9 +146,9 @@ def build_benchmarks(benchmark_configs, experiment_benchmarks):
                 benchmark_i.add_info(info, benchmark_configs[benchmark_suite][benchmark]["info"][info])
             for parameter in benchmark_configs[benchmark_suite][benchmark]["parameters"]:
                 if parameter in benchmark_configs["overrides"]:
-                    benchmark_i.add_parameter(parameter, benchmark_configs["overrides"][parameter])
+                    benchmark_i.set_parameter(parameter, benchmark_configs["overrides"][parameter])
                 else:
-                    benchmark_i.add_parameter(parameter, \
+                    benchmark_i.set_parameter(parameter, \
                             benchmark_configs[benchmark_suite][benchmark]["parameters"][parameter])
 
             # Append benchmark to benchmark list
@@ -231,6 +227,7 @@ def build_experiments(configs):
                     return experiments, errors
 
         for operation in experiment_i.operations:
+            if configs["general"]["plan"]: break
             experiment_i.create_output_directories(\
                         configs["general"], operation, \
                         configs["general"]["retain-old"])
@@ -258,6 +255,21 @@ def operate_experiments(general_configs, experiments):
 
 
 
+"""
+Plan the execution of each experiment and estimate how long executing all of them takes
+"""
+def plan_experiments(general_configs, experiments):
+    total_duration = 0.0
+    for experiment in experiments:
+        if "execute" in experiment.operations:
+            total_duration += experiment.plan(general_configs)
+    finish_time = datetime.datetime.now() + datetime.timedelta(seconds=total_duration)
+    print_step("PLAN", Fore.BLUE, "Estimated time: " + format_duration(total_duration) + ", done around " + \
+                finish_time.strftime("%d/%m/%Y %H:%M:%S"))
+    return
+
+
+
 """
 Main: Parses and adjusts arguments passed in to ensure it matches system configs. Also
       calls execute and process functions.
@@ -273,8 +285,22 @@ def main():
             "Benchmarks configuration YAML file (default = benchmarks.yml)", default="benchmarks.yml")
     parser.add_argument("-r", "--retain_old", help = \
             "Do not delete old data - *.json or graphs (default = false)", action='store_true')
+    parser.add_argument("-R", "--resume", help = \
+            "Resume an interrupted campaign, skipping the runs its journal holds as finished (implies -r)", \
+            action='store_true')
+    parser.add_argument("-p", "--plan", help = \
+            "List the jobs to execute in order with their estimated run times, without running them", \
+            action='store_true')
     parser.add_argument("-i", "--interactive", help = \
             "Interactive mode for confirming options and interacting with the analysis tool", action='store_true')
+    parser.add_argument("-f", "--force_process", help = \
+            "Reprocess every sample even if its raw files did not change (default = false)", action='store_true')
+    parser.add_argument("-c", "--schedule", help = \
+            "Job scheduling policy when executing: 'serial' or 'concurrent' (default = general.yml's schedule-policy)", \
+            choices=["serial", "concurrent"], default=None)
+    parser.add_argument("-j", "--jobs", help = \
+            "Number of parallel jobs when processing results, 0 for all CPUs (default = general.yml's jobs)", \
+            type=int, default=None)
     args = parser.parse_args()
 
     # Open up the yaml files and get the configurations. Report any found errors
@@ -293,7 +319,15 @@ def main():
             configs[config] = loaded_config
     except yaml.YAMLError as exception:
         print_error(exception); print_error(config_filename + " configuration file is not formatted correctly!"); return
-    configs["general"]["retain-old"] = args.retain_old
+    configs["general"]["retain-old"] = args.retain_old or args.resume
+    configs["general"]["resume"] = args.resume
+    configs["general"]["plan"] = args.plan
+    if args.force_process:
+        configs["general"]["script-settings"]["process-cache"] = False
+    if args.schedule is not None:
+        configs["general"]["script-settings"]["schedule-policy"] = args.schedule
+    if args.jobs is not None:
+        configs["general"]["script-settings"]["jobs"] = args.jobs
 
     # Create the general directories if not found
     general_directories = ["results", "benchmarks", "tools", "scripts", "analysis"]
@@ -308,6 +342,10 @@ def main():
     experiments, errors = build_experiments(configs)
     if errors > 0: return
 
+    # Only list what executing would run when planning
+    if args.plan:
+        plan_experiments(configs["general"], experiments); return
+
     # General function to execute, process, and analyze the experiments
     operate_experiments(configs["general"], experiments)
     return
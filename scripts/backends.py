@@ -7,69 +7,253 @@ Purpose: Functions for executing or processing
 """""""""""""""""""""""""""""""""""""""""""""""""""
 
 import os
+import glob
+import socket
 import subprocess
 import signal
 import sys
 import time
 import datetime
 import argparse
-import yaml
-import numa
 import json
-import numpy as np
-import matplotlib.pyplot as plt
-from collections import Counter
+import hashlib
+import importlib
+import statistics
+import threading
+import concurrent.futures
 from colorama import Fore, Back, Style
 
 
 
 """
-Manage Redis: Force redis to a specific NUMA node if need be
+Lazy imports: numpy and matplotlib make up most of the startup time while executing or planning
+never touches them, so each loads on its first use. Plots go through the non-interactive Agg
+backend since analysis runs on headless servers
 """
-def manage_redis(general_configs, action):
-    errors = 0
-    if (action == "start"):
-        # Create command dependent on what NUMA preferences found within the configuration files
-        cmd = general_configs["exe-prefixes"]["numa"]
-        cmd += " " + os.path.join(general_configs["paths"]["redis-directory"], "redis-server")
+class lazy_import:
+    def __init__(self, name, before_import=None):
+        self.name = name
+        self.before_import = before_import
+        self.module = None
 
-        # Try running the redis-server on the desired NUMA configuration
-        print_step("TOOLS", Fore.CYAN, "Redis start command: " + cmd)
+
+    def __getattr__(self, attribute):
+        if self.module is None:
+            if self.before_import is not None:
+                self.before_import()
+            self.module = importlib.import_module(self.name)
+        return getattr(self.module, attribute)
+
+
+def use_agg_backend():
+    import matplotlib
+    matplotlib.use("Agg")
+
+
+np = lazy_import("numpy")
+plt = lazy_import("matplotlib.pyplot", use_agg_backend)
+
+
+
+"""
+Process groups: Commands started in their own session (start_new_session) are torn down as a whole
+group, including children running under sudo, which only root may signal. SIGTERM (relayed by sudo
+to its command) comes first, then SIGKILL, which sudo can not relay, is also sent through sudo
+"""
+def signal_group(pgid, signal_number, through_sudo=False):
+    try:
+        os.killpg(pgid, signal_number)
+    except ProcessLookupError:
+        return
+    except PermissionError:
+        through_sudo = True
+    if through_sudo:
+        subprocess.run(["sudo", "-n", "kill", "-" + str(int(signal_number)), "--", "-" + str(pgid)], \
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def group_alive(pgid):
+    try:
+        os.killpg(pgid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# Returns whether the process and everything left in its group are gone
+def stop_group(process, grace_period):
+    for signal_number in [signal.SIGTERM, signal.SIGKILL]:
+        signal_group(process.pid, signal_number, through_sudo=(signal_number == signal.SIGKILL))
+        deadline = time.monotonic() + grace_period
+        while time.monotonic() < deadline:
+            process.poll()
+            if not group_alive(process.pid):
+                return True
+            time.sleep(0.1)
+    process.poll()
+    return not group_alive(process.pid)
+
+
+
+"""
+Redis manager: Tracks the redis-server it started through its own process group (never through
+ps/grep), waits for it to answer PING before benchmarks use it, shuts it down cleanly, and
+removes the dump files left behind. With redis-reuse, one server stays alive across samples
+(flushed in between) for as long as its NUMA binding does not change
+"""
+class redis_manager:
+    host = "127.0.0.1"
+    port = 6379
+    ready_timeout = 30
+    stop_timeout = 10
+    def __init__(self):
+        self.process = None
+        self.numa_prefix = None
+        self.server_version = None
+
+
+    # Send a single command using the Redis protocol (RESP) and return the first reply line
+    def command(self, arguments, timeout=5):
+        request = "*" + str(len(arguments)) + "\r\n"
+        for argument in arguments:
+            request += "$" + str(len(argument.encode())) + "\r\n" + argument + "\r\n"
+        with socket.create_connection((redis_manager.host, redis_manager.port), timeout=timeout) as connection:
+            connection.sendall(request.encode())
+            reply = connection.recv(4096)
+        return reply.decode(errors="replace").split("\r\n")[0]
+
+
+    # First reply line to PING ("-LOADING ..." while a snapshot is read back), empty if nothing answers
+    def status(self):
         try:
-            redis_proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-            time.sleep(2)
-        except:
-            print_error("Error found when running the redis-server"); errors += 1
+            return self.command(["PING"], timeout=1)
+        except OSError:
+            return ""
 
-    else:
-        # Try to flush the redis server to save up a bit of memory
-        print_step("TOOLS", Fore.CYAN, "Redis flush and kill")
+
+    def ping(self):
+        return self.status() == "+PONG"
+
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+
+    def start(self, general_configs, numa_prefix="", server_arguments=[]):
+        # Reuse the running server when allowed and nothing about it changed
+        if general_configs["script-settings"]["redis-reuse"] and self.alive() and \
+                self.numa_prefix == numa_prefix and len(server_arguments) == 0:
+            print_step("TOOLS", Fore.CYAN, "Reusing Redis server (FLUSHALL)")
+            try:
+                if self.command(["FLUSHALL"], timeout=redis_manager.ready_timeout) == "+OK":
+                    return 0
+            except OSError:
+                pass
+            print_warning("Could not flush the reused Redis server, restarting it")
+        if self.alive():
+            self.stop(general_configs, final=True)
+        if self.ping():
+            print_error("Another Redis server is already listening on port " + str(redis_manager.port)); return 1
+
+        cmd = " ".join([numa_prefix, os.path.join(general_configs["paths"]["redis-directory"], "redis-server"), \
+                        "--port", str(redis_manager.port)] + server_arguments).strip()
+        print_step("TOOLS", Fore.CYAN, "Redis start command: " + cmd)
         try:
-            subprocess.run(os.path.join(general_configs["paths"]["redis-directory"], "redis-cli") + " FLUSHALL", \
-                        shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except:
-            print_error("Could not flush the Redis server"); errors += 1
-            return errors
+            self.process = subprocess.Popen(cmd, shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, \
+                                            start_new_session=True)
+        except OSError:
+            print_error("Error found when running the redis-server"); return 1
+        self.numa_prefix = numa_prefix if len(server_arguments) == 0 else None
+
+        # Wait until the server answers (bounded) instead of sleeping a fixed amount of time
+        deadline = time.monotonic() + redis_manager.ready_timeout
+        while time.monotonic() < deadline:
+            server_status = self.status()
+            if server_status == "+PONG":
+                return 0
+            if server_status.startswith("-LOADING"):
+                deadline = time.monotonic() + redis_manager.ready_timeout
+            if self.process.poll() is not None:
+                print_error("redis-server exited with code " + str(self.process.returncode)); return 1
+            time.sleep(0.05)
+        print_error("redis-server did not answer within " + str(redis_manager.ready_timeout) + "s")
+        self.stop(general_configs, final=True)
+        return 1
 
-        # Kill any process associated with the redis-server
+
+    def stop(self, general_configs, final=False):
+        if self.process is None:
+            return 0
+        if general_configs["script-settings"]["redis-reuse"] and not final and self.alive():
+            return 0
+
+        print_step("TOOLS", Fore.CYAN, "Redis shutdown")
+        errors = 0
         try:
-            for line in os.popen("ps ax | grep redis-server | grep -v grep"):
-                fields = line.split()
-                pid = fields[0]
-                os.kill(int(pid), signal.SIGKILL)
-            time.sleep(2)
-        except:
-            print_error("Could not kill Redis server"); errors += 1
+            self.command(["SHUTDOWN", "NOSAVE"], timeout=redis_manager.stop_timeout)
+        except OSError:
+            pass
+        try:
+            self.process.wait(timeout=redis_manager.stop_timeout)
+        except subprocess.TimeoutExpired:
+            # Only signal the server's own process group, never every redis-server on the host
+            if not stop_group(self.process, redis_manager.stop_timeout):
+                print_error("Could not stop Redis server"); errors += 1
+        self.process = None
+        self.numa_prefix = None
 
         # Remove any backed up db files to lighten load on starting new server and prevent cloging up storage
         possible_directories = [general_configs["paths"]["script-root"], \
             general_configs["paths"]["redis-directory"], os.getcwd()]
-        for directory in possible_directories:
+        for directory in set(possible_directories):
+            for dump_file in glob.glob(os.path.join(directory, "*.rdb")):
+                try:
+                    os.remove(dump_file)
+                except OSError:
+                    print_warning("Could not remove Redis dump file " + dump_file)
+        return errors
+
+
+    # The v= field of 'redis-server --version' (snapshots are only restored by the version that wrote them)
+    def version(self, general_configs):
+        if self.server_version is None:
+            self.server_version = ""
             try:
-                os.remove(directory + "/*.rdb")
-            except:
-                pass
-    return errors
+                version_output = subprocess.run([os.path.join(general_configs["paths"]["redis-directory"], \
+                        "redis-server"), "--version"], capture_output=True, text=True, timeout=10).stdout
+                for field in version_output.split():
+                    if field.startswith("v="):
+                        self.server_version = field[len("v="):]
+            except (OSError, subprocess.TimeoutExpired):
+                print_warning("Could not get the redis-server version")
+        return self.server_version
+
+
+    # Synchronously write the dataset to the server's --dir/--dbfilename
+    def save(self):
+        try:
+            if self.command(["SAVE"], timeout=None) == "+OK":
+                return 0
+        except OSError:
+            pass
+        print_error("Could not save the Redis dataset"); return 1
+
+
+redis_server = redis_manager()
+
+
+"""
+Manage Redis: Force redis to a specific NUMA node if need be. 'end' keeps a reused server
+alive, 'shutdown' always stops it, 'save' snapshots the dataset
+"""
+def manage_redis(general_configs, action, numa_prefix="", server_arguments=[]):
+    if action == "start":
+        return redis_server.start(general_configs, numa_prefix, server_arguments)
+    if action == "save":
+        return redis_server.save()
+    return redis_server.stop(general_configs, final=(action == "shutdown"))
 
 
 
@@ -100,21 +284,312 @@ def split_rec(k, v, out):
         out[k] = v
 
 
-def average_dicts(processed_data):
-    # Flatten the data processed from each sample
-    flattened_processed_data = []
+def set_nested_value(dict1, keys, value):
+    if len(keys) == 0:
+        return value
+    nested = dict1
+    for key in keys[:-1]:
+        nested = nested.setdefault(key, {})
+    nested[keys[-1]] = value
+    return dict1
+
+
+def get_nested_value(dict1, keys):
+    for key in keys:
+        dict1 = dict1[key]
+    return dict1
+
+
+"""
+Running statistics: Welford's single pass mean and variance of a metric across samples, along
+with its extremes and the half width of its 95% confidence interval (Student's t)
+"""
+class running_stats:
+    # Two-sided 95% t values by degrees of freedom (the closest lower entry is used above 30)
+    t_table = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, \
+               9: 2.262, 10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, \
+               17: 2.110, 18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, \
+               25: 2.060, 26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042, 40: 2.021, 60: 2.000, \
+               120: 1.980}
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = self.max = None
+
+
+    def add(self, value):
+        value = float(value)
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+
+    def stddev(self):
+        if self.count < 2: return 0.0
+        return (self.m2 / (self.count - 1)) ** 0.5
+
+
+    def ci95(self):
+        if self.count < 2: return 0.0
+        degrees_of_freedom = max([df for df in running_stats.t_table if df <= self.count - 1])
+        t_value = running_stats.t_table[degrees_of_freedom] if self.count - 1 <= 120 else 1.960
+        return t_value * self.stddev() / self.count ** 0.5
+
+
+
+# Returns the running statistics of every (flattened) metric found in the samples' data
+def aggregate_dicts(processed_data):
+    statistics = {}
     for data in processed_data:
-        flattened_processed_data.append({ k:v for k,v in flatten_dict(processed_data[data]) })
+        for key, value in flatten_dict(processed_data[data]):
+            if isinstance(value, bool) or not isinstance(value, (int, float)): continue
+            if key not in statistics:
+                statistics[key] = running_stats()
+            statistics[key].add(value)
+    return statistics
+
 
-    # Average the data found in each sample (from flattened dictionaries)
-    sums = Counter()
-    counters = Counter()
-    for itemset in flattened_processed_data:
-        sums.update(itemset)
-        counters.update(itemset.keys())
+def average_dicts(processed_data, statistics=None):
+    if statistics is None:
+        statistics = aggregate_dicts(processed_data)
 
     # Covert the flattened data to nested dictionaries and dump the data to the proper results directory
-    return nest_dict({x: round(float(sums[x])/counters[x], 2) for x in sums.keys()})
+    return nest_dict({key: statistics[key].mean for key in statistics})
+
+
+
+"""
+Metric index: Maps every '_' separated segment of the flattened result keys to the set of
+keys holding it, so a metric is found by intersecting the sets of its segments. A segment
+matches exactly when some key holds it, otherwise it matches within a key's segment (so
+C-States finds PCM's 'Core C-States', as the original substring search did)
+"""
+class metric_index:
+    default_leaves = ["mean"]
+    def __init__(self, flattened_results, flattened_errors=None):
+        self.results = flattened_results
+        self.errors = flattened_errors if flattened_errors is not None else {}
+        self.segments = {}
+        for key in flattened_results:
+            for segment in key.split('_'):
+                if segment not in self.segments:
+                    self.segments[segment] = set()
+                self.segments[segment].add(key)
+
+
+    def keys_with(self, segment):
+        if segment in self.segments:
+            return self.segments[segment]
+        keys = set()
+        for key_segment in self.segments:
+            if segment in key_segment:
+                keys |= self.segments[key_segment]
+        return keys
+
+
+    # Returns every key holding all of the segments, most general (fewest segments) first
+    def lookup(self, segments):
+        matches = None
+        for segment in sorted(set(segments), key=lambda segment: len(self.segments.get(segment, ()))):
+            segment_keys = self.keys_with(segment)
+            matches = set(segment_keys) if matches is None else (matches & segment_keys)
+            if len(matches) == 0:
+                return []
+        if matches is None:
+            return []
+
+        # Summarized metrics (e.g. PCM's mean/p50/p99/max) default to their mean unless one is asked for
+        if len(matches) > 1:
+            default_matches = [key for key in matches if key.split('_')[-1] in metric_index.default_leaves \
+                                and key.split('_')[-1] not in segments]
+            if len(default_matches) > 0:
+                matches = default_matches
+        return sorted(matches, key=lambda key: (len(key.split('_')), key))
+
+
+
+"""
+Run independent units of work, fanning out to a process pool when more than one job is
+requested. Results are returned in the same order as the units for deterministic merging, as
+(result, None), or (None, reason) for a unit that raised so the others are still kept
+"""
+def run_units(jobs, function, units):
+    if jobs <= 0:
+        jobs = os.cpu_count()
+    if jobs == 1 or len(units) <= 1:
+        return [unit_result(lambda: function(*unit)) for unit in units]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(units))) as executor:
+        futures = [executor.submit(function, *unit) for unit in units]
+        return [unit_result(future.result) for future in futures]
+
+
+def unit_result(get_result):
+    try:
+        return get_result(), None
+    except Exception as exception:
+        return None, type(exception).__name__ + ": " + str(exception)
+
+
+
+"""
+Processing cache: Fingerprint (size, mtime, hash) the raw inputs of a processed sample so
+unchanged samples are not parsed again. Files are only hashed when size and mtime disagree
+"""
+def hash_file(path):
+    file_hash = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 20), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def file_fingerprint(path, previous={}):
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if previous.get("size") == stat.st_size and previous.get("mtime") == stat.st_mtime_ns and "hash" in previous:
+        fingerprint["hash"] = previous["hash"]
+    else:
+        fingerprint["hash"] = hash_file(path)
+    return fingerprint
+
+
+def manifest_is_current(manifest_path, inputs, version):
+    if not os.path.exists(manifest_path):
+        return False
+    try:
+        with open(manifest_path, "r") as manifest_fp:
+            manifest = json.load(manifest_fp)
+    except (OSError, ValueError):
+        return False
+    if manifest.get("version") != version or \
+            sorted(manifest.get("inputs", {})) != sorted(os.path.basename(path) for path in inputs):
+        return False
+    touched = False
+    for path in inputs:
+        previous = manifest["inputs"][os.path.basename(path)]
+        stat = os.stat(path)
+        if stat.st_size != previous["size"]:
+            return False
+        if stat.st_mtime_ns != previous["mtime"]:
+            if hash_file(path) != previous["hash"]:
+                return False
+            previous["mtime"] = stat.st_mtime_ns
+            touched = True
+
+    # Touched or copied but unchanged, keep the new mtime so the next run does not hash it again
+    if touched:
+        write_data(manifest, manifest_path)
+    return True
+
+
+def write_manifest(manifest_path, inputs, version):
+    manifest = {"version": version, "inputs": {}}
+    for path in inputs:
+        manifest["inputs"][os.path.basename(path)] = file_fingerprint(path)
+    write_data(manifest, manifest_path)
+
+
+
+"""
+Run journal: Append-only record (JSON lines) of every unit an experiment finished executing, i.e.
+(suite, benchmark, config, mode, sample) with the fingerprint of its command. Outputs are synced to
+disk before a unit is recorded, so a resumed campaign only re-runs units that were in flight. Only the
+unit's own outputs are synced, other benchmarks may still be measured while it is recorded
+"""
+class run_journal:
+    def __init__(self, path, experiment_name, resume=False):
+        self.path = path
+        self.experiment = experiment_name
+        self.completed = {}
+        self.lock = threading.Lock()
+        if not resume or not os.path.exists(path):
+            open(path, "w").close(); return
+        with open(path, "r") as journal_fp:
+            lines = journal_fp.readlines()
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue    # Cut short by a crash while being written
+            self.completed[run_journal.unit(entry)] = entry["fingerprint"]
+        if len(lines) > 0 and not lines[-1].endswith("\n"):
+            with open(path, "a") as journal_fp:
+                journal_fp.write("\n")
+        print_step("RESUME", Fore.BLUE, str(len(self.completed)) + " unit(s) of " + experiment_name + \
+                    " already finished, see " + path)
+
+
+    @staticmethod
+    def unit(entry):
+        return (entry["suite"], entry["benchmark"], entry["config"], entry["mode"], entry["sample"])
+
+
+    def complete(self, suite, benchmark, config, mode, sample, fingerprint):
+        with self.lock:
+            return self.completed.get((suite, benchmark, config, mode, sample)) == fingerprint
+
+
+    @staticmethod
+    def sync(path):
+        try:
+            file_descriptor = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(file_descriptor)
+        except OSError:
+            pass
+        finally:
+            os.close(file_descriptor)
+
+
+    # Outputs are the unit's files (and the directories holding them, for files it created)
+    def record(self, suite, benchmark, config, mode, sample, fingerprint, outputs):
+        entry = {"experiment": self.experiment, "suite": suite, "benchmark": benchmark, "config": config, \
+                 "mode": mode, "sample": sample, "fingerprint": fingerprint, "time": time.time()}
+        for path in sorted(set(outputs) | set([os.path.dirname(os.path.abspath(path)) for path in outputs])):
+            run_journal.sync(path)
+        with self.lock:
+            with open(self.path, "a") as journal_fp:
+                journal_fp.write(json.dumps(entry) + "\n")
+                journal_fp.flush()
+                os.fsync(journal_fp.fileno())
+            self.completed[run_journal.unit(entry)] = fingerprint
+
+
+
+"""
+Run history: Durations of past samples per benchmark command fingerprint, kept across campaigns
+(<results directory>/history.json) to estimate how long the next one takes
+"""
+class run_history:
+    kept_durations = 5
+    def __init__(self, path):
+        self.path = path
+        self.durations = {}
+        self.lock = threading.Lock()
+        try:
+            with open(path, "r") as history_fp:
+                self.durations = json.load(history_fp)
+        except (OSError, ValueError):
+            pass
+
+
+    def record(self, fingerprint, duration):
+        with self.lock:
+            durations = self.durations.get(fingerprint, []) + [round(duration, 3)]
+            self.durations[fingerprint] = durations[-run_history.kept_durations:]
+            write_data(self.durations, self.path)
+
+
+    def estimate(self, fingerprint):
+        if len(self.durations.get(fingerprint, [])) == 0:
+            return None
+        return float(statistics.median(self.durations[fingerprint]))
 
 
 
@@ -130,6 +605,13 @@ def print_warning(stmt):
 def print_step(step, color, stmt):
     print(color + "[" + step + "] " + Style.RESET_ALL + stmt)
 
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    hours, minutes, seconds = seconds // 3600, seconds % 3600 // 60, seconds % 60
+    if hours > 0:
+        return str(hours) + "h " + str(minutes).zfill(2) + "m " + str(seconds).zfill(2) + "s"
+    return str(minutes) + "m " + str(seconds).zfill(2) + "s"
+
 
 
 
@@ -14,15 +14,23 @@ import sys
 import time
 import datetime
 import argparse
-import yaml
-import numa
 import re
 import json
-import numpy as np
-import matplotlib.pyplot as plt
-from collections import Counter
+import shutil
+import glob
+import zlib
+import hashlib
 from colorama import Fore, Back, Style
 from backends import *
+from monitors import *
+from topology import *
+from histograms import *
+from supervisor import *
+
+
+
+# Bump when the generic (PCM, vmstat, ...) processing changes to invalidate cached samples
+PROCESS_VERSION = 7
 
 
 
@@ -32,12 +40,23 @@ Base benchmark (suite) class(es)
 
 """""""""""""""""""""""""""""""""""""""
 class benchmark:
-    vmstat_metrics = ["numa_hit", "numa_miss", "numa_page_migrated", "pgmigrate_success", \
+    vmstat_metrics = ["numa_hit", "numa_miss", "numa_pages_migrated", "pgmigrate_success", \
             "pgmigrate_fail", "numa_local", "numa_foreign"]
+    process_version = 1     # NOTE: Bump in a benchmark suite when its process_specific() changes
+    concurrent_safe = True  # NOTE: Set to False for suites that can not co-run with others (shared servers)
+    exclusive_directory = False # NOTE: Set to True for suites whose runs write fixed files into their directory
+    uses_redis = False      # NOTE: Set to True for suites that run against the redis-server
+    timeout_slack = 300     # Seconds added to derived timeouts (startup, loading data sets, ...)
     def __init__(self, name="Null", suite="Null"):
         self.name = name
         self.suite = suite if suite != "Null" else self.name
         self.parameters = []
+        self.raw_parameters = {}
+        self.exe_prefixes = {}
+        self.journal = None
+        self.history = None
+        self.run_failed = False
+        self.shared_host = False    # Co-scheduled with other jobs, so system wide counters are not its own
         self.info = {}
         self.results = {}
         self.analyze_categories = ["general"]
@@ -51,6 +70,34 @@ class benchmark:
         self.parameters.append("--" + name + "=" + str(value))
 
 
+    def set_parameter(self, name, value):
+        self.raw_parameters[name] = value
+        self.add_parameter(name, value)
+
+
+    # Rebuild the command line parameters with one of them changed (e.g. a step of a parameter sweep)
+    def override_parameter(self, name, value):
+        self.raw_parameters = dict(self.raw_parameters)
+        self.raw_parameters[name] = value
+        self.parameters = []
+        for parameter in self.raw_parameters:
+            self.add_parameter(parameter, self.raw_parameters[parameter])
+
+
+    # NOTE: Overwrite this if a benchmark suite uses more (or fewer) CPUs than its threads parameter
+    def cpu_demand(self):
+        return int(self.raw_parameters.get("threads", 1))
+
+
+    # NOTE: Overwrite this if a benchmark suite's run time follows from other parameters
+    # Seconds a sample should take going by the parameters alone (None when they do not tell)
+    def estimate_duration(self):
+        for parameter in ["test-time", "time"]:
+            if parameter in self.raw_parameters:
+                return float(self.raw_parameters[parameter]) * int(self.raw_parameters.get("run-count", 1))
+        return None
+
+
     def add_result(self, name, value, specificity):
         benchmark.results[self.suite][self.name][specificity][name] = value
 
@@ -59,12 +106,12 @@ class benchmark:
         vmstat_values = {}
         with open("/proc/vmstat", 'r') as vmstat:
             for line in vmstat:
-                for metric in benchmark.vmstat_metrics:
-                    if metric in line:
-                        if difference:
-                            vmstat_values[metric] = int(line.strip().split()[1]) - starting_values[metric]
-                        else:
-                            vmstat_values[metric] = int(line.strip().split()[1])
+                metric = line.strip().split()[0]
+                if metric in benchmark.vmstat_metrics:
+                    if difference:
+                        vmstat_values[metric] = int(line.strip().split()[1]) - starting_values[metric]
+                    else:
+                        vmstat_values[metric] = int(line.strip().split()[1])
         return vmstat_values
 
 
@@ -72,14 +119,14 @@ class benchmark:
         root_to_glob = os.path.join( \
                             general_configs["paths"]["script-root"], \
                             general_configs["paths"]["results-directory"], name)
-        for exe_prefix in general_configs["exe-prefixes"]:
+        for exe_prefix in self.exe_prefixes:
             if "pcm" in exe_prefix:
-                new_exe_pcm_prefix = general_configs["exe-prefixes"][exe_prefix].split(" ")
+                new_exe_pcm_prefix = self.exe_prefixes[exe_prefix].split(" ")
                 for parameter_index in range(len(new_exe_pcm_prefix)):
                     if "csv" in new_exe_pcm_prefix[parameter_index]:
                         new_exe_pcm_prefix[parameter_index] = "-csv=" + root_to_glob + \
                                                     "-" + exe_prefix + ".csv"
-                general_configs["exe-prefixes"][exe_prefix] = " ".join(new_exe_pcm_prefix)
+                self.exe_prefixes[exe_prefix] = " ".join(new_exe_pcm_prefix)
 
 
     def execute(self, general_configs, sample, start_str_order=[]):
@@ -90,124 +137,247 @@ class benchmark:
         if not os.path.exists(self.info["path"]):
             print_error("Could not find path to benchmark's executable at: " + self.info["path"]); return
 
-        # Set up timer, outputs, and starting data before running
+        # Set up outputs, the supervisor, and starting data before running
         output_file = os.path.join(general_configs["paths"]["results-directory"], self.active_name + ".txt")
         output_fp = open(output_file, 'w')
-        starting_numa_results = self.get_vmstat_info()
-        start_time = time.time()
-
-        # RUN!
+        active_supervisor = supervisor(general_configs["script-settings"]["status-update-interval"], \
+                lambda update: print_step("UPDATE - " + str(update), Fore.YELLOW, self.suite + " - " + \
+                    self.name + ": " + datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S")), \
+                self.run_timeout(general_configs))
+        execute_status = "ok"
+        starting_numa_results = self.get_vmstat_info() if not self.shared_host else {}
+        active_vmstat_sampler = active_process_sampler = None
+        if general_configs["script-settings"]["vmstat-interval"] > 0 and not self.shared_host:
+            active_vmstat_sampler = vmstat_sampler(general_configs["script-settings"]["vmstat-interval"])
+            active_vmstat_sampler.start()
+        start_time = end_time = time.monotonic()
+
+        # RUN! Monitors start first so they see the whole run, which is timed from right before Popen
         try:
-            update = time_counter = 0
+            self.start_monitors(general_configs, active_supervisor)
+            active_supervisor.mark_start()
             active_benchmark = subprocess.Popen(self.active_cmd, cwd=self.info["path"], \
-                stdout=output_fp, shell=True, stderr=subprocess.DEVNULL)
-            while active_benchmark.poll() is None:
-                time.sleep(1)
-                time_counter += 1
-                if time_counter >= general_configs["script-settings"]["status-update-interval"]:
-                    time_counter = 0
-                    update += 1
-                    print_step("UPDATE - " + str(update), Fore.YELLOW, self.suite + " - " + self.name + \
-                        ": " + datetime.datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
+                stdout=output_fp, shell=True, stderr=subprocess.DEVNULL, start_new_session=True)
+            active_supervisor.add("benchmark", active_benchmark, primary=True)
+            if general_configs["script-settings"]["process-interval"] > 0:
+                active_process_sampler = process_sampler(active_benchmark.pid, \
+                        general_configs["script-settings"]["process-interval"], \
+                        general_configs["script-settings"]["numa-maps-every"])
+                active_process_sampler.start()
+            start_time, end_time = active_supervisor.run()
         except:
             print_error("Failed to run benchmark!")
+            execute_status = "error"
             try:
-                active_benchmark.terminate()
+                active_supervisor.stop()
             except:
                 pass
+            start_time = active_supervisor.start_time if active_supervisor.start_time > 0 else start_time
+            end_time = time.monotonic()
+
+        # Runs that timed out or were killed (e.g. OOM) are marked failed, so they are not averaged in
+        if active_supervisor.timed_out:
+            execute_status = "timeout"
+        elif execute_status == "ok" and active_supervisor.primary is not None and \
+                (active_supervisor.primary.returncode < 0 or active_supervisor.primary.returncode > 128):
+            execute_status = "signal-" + str(abs(active_supervisor.primary.returncode) % 128)
+        if execute_status != "ok":
+            print_warning(self.name + " sample " + str(sample) + " failed (" + execute_status + ")")
+            self.run_failed = True
 
         # End and capture data results
-        end_time = time.time()
-        final_numa_results = self.get_vmstat_info(True, starting_numa_results)
+        if active_process_sampler != None:
+            active_process_sampler.stop()
+            active_process_sampler.save(os.path.join(general_configs["paths"]["results-directory"], \
+                    self.active_name + "-proc.npz"))
+        if active_vmstat_sampler != None:
+            active_vmstat_sampler.stop()
+            active_vmstat_sampler.save(os.path.join(general_configs["paths"]["results-directory"], \
+                    self.active_name + "-vmstat.npz"))
+        final_numa_results = self.get_vmstat_info(True, starting_numa_results) if not self.shared_host else {}
         for parameter in final_numa_results:
             output_fp.write(parameter + " = " + str(final_numa_results[parameter]) + "\n")
+        output_fp.write("execute-status = " + execute_status + "\n")
+        output_fp.write("execute-shared-host = " + ("1" if self.shared_host else "0") + "\n")
+        output_fp.write("execute-start = " + str(active_supervisor.start_timestamp) + "\n")
+        output_fp.write("execute-time = " + str(end_time - start_time) + "\n")
         output_fp.close()
-        print_step("EXECUTE - FINISH", Fore.GREEN, "Time taken (nearest second): " + \
-                    str(end_time - start_time) + "s")
+        print_step("EXECUTE - FINISH", Fore.GREEN, "Time taken: " + str(round(end_time - start_time, 3)) + "s")
+
+
+    # Monitor commands (general.yml's monitors) run alongside the benchmark, each into its own file
+    def start_monitors(self, general_configs, active_supervisor):
+        if general_configs.get("monitors") == None: return
+        for monitor in general_configs["monitors"]:
+            monitor_file = os.path.join(general_configs["paths"]["results-directory"], \
+                                self.active_name + "-" + monitor + ".out")
+            with open(monitor_file, 'w') as monitor_fp:
+                active_supervisor.add(monitor, subprocess.Popen(general_configs["monitors"][monitor], \
+                    shell=True, stdout=monitor_fp, stderr=subprocess.DEVNULL, start_new_session=True))
+
+
+    def process_execution(self, general_configs, sample, data):
+        with open(self.active_name + ".txt", "r") as fp:
+            for line in fp:
+                if line.startswith("execute-time = "):
+                    data["System"]["execute-time-(s)"] = float(line.split(" ")[2].strip())
+                elif line.startswith("execute-status = "):
+                    data["System"]["execute-failed"] = 0.0 if line.split(" ")[2].strip() == "ok" else 1.0
+                elif line.startswith("execute-shared-host = "):
+                    data["System"]["shared-host"] = float(line.split(" ")[2].strip())
 
 
     # NOTE: Overwrite this if needed for each added benchmark suite!
     def execute_wrapper(self, general_configs):
-        for sample in range(general_configs["script-settings"]["samples"]):
+        for sample in self.execute_samples(general_configs):
             # Set active name, PCM file outputs, and command, then run!
             self.active_name = self.active_glob + "-" + str(sample)
             self.change_pcm_output_csv_files(general_configs, self.active_name)
-            cmd_order = [" ".join(general_configs["exe-prefixes"].values()), \
+            cmd_order = [" ".join(self.exe_prefixes.values()), \
                         "./" + self.info["executable"], \
                         " ".join(self.parameters)]
             self.active_cmd = " ".join(cmd_order)
             self.execute(general_configs, sample)
 
 
+    # Yields the samples to run (the caller runs each sample before asking for the next one). Adaptive
+    # sampling processes each sample right after it ran and stops once the 95% confidence interval of
+    # the suite's key metric is within adaptive-error of its mean, or at adaptive-max-samples. The
+    # number of samples taken is kept in <active glob>.samples for processing. Samples the journal
+    # holds as finished (when resuming) are not run again
+    def execute_samples(self, general_configs):
+        settings = general_configs["script-settings"]
+        max_samples = settings["samples"]
+        if settings["adaptive-sampling"]:
+            max_samples = max(settings["adaptive-max-samples"], settings["samples"])
+        key_metric = self.adaptive_metric(general_configs)
+        key_metric_stats = running_stats()
+        for sample in range(max_samples):
+            if self.journal_complete("sample", sample):
+                print_step("EXECUTE - RESUME", Fore.GREEN, "Skipping finished sample " + str(sample) + \
+                            " of " + self.active_glob)
+            else:
+                sample_start = time.monotonic()
+                self.run_failed = False
+                yield sample
+                if not self.run_failed:
+                    if self.history is not None:
+                        self.history.record(self.command_fingerprint(), time.monotonic() - sample_start)
+                    self.journal_record(general_configs, "sample", sample)
+            with open(os.path.join(general_configs["paths"]["results-directory"], \
+                                    self.active_glob + ".samples"), "w") as samples_file:
+                samples_file.write(str(sample + 1) + "\n")
+            if not settings["adaptive-sampling"]: continue
+
+            values = self.sample_metrics(general_configs, key_metric, [sample])
+            if len(values) == 0:
+                print_warning("Could not find " + key_metric + " for " + self.name + ", it can not converge"); continue
+            key_metric_stats.add(values[0])
+            relative_error = key_metric_stats.ci95() / abs(key_metric_stats.mean) if key_metric_stats.mean != 0 else 0.0
+            print_step("EXECUTE - SAMPLES", Fore.GREEN, self.name + " " + key_metric + " = " + \
+                    str(round(key_metric_stats.mean, 4)) + " +/- " + str(round(relative_error * 100, 2)) + \
+                    "% after " + str(sample + 1) + " sample(s)")
+            if sample + 1 >= settings["samples"] and key_metric_stats.count >= 2 and \
+                    relative_error <= settings["adaptive-error"]:
+                return
+        if settings["adaptive-sampling"]:
+            print_warning(self.name + " did not converge within " + str(max_samples) + " samples")
+
+
+    # Changing what a benchmark runs (executable, parameters) makes its journaled units stale
+    def command_fingerprint(self):
+        command = {"suite": self.suite, "benchmark": self.name, "executable": self.info.get("executable"), \
+                   "parameters": self.parameters}
+        return hashlib.sha1(json.dumps(command, sort_keys=True).encode()).hexdigest()[:16]
+
+
+    # Seconds a run may take before it is stopped: the benchmark's timeout info, else the run-timeout
+    # setting, else timeout-factor times its estimated duration (None means no timeout)
+    def run_timeout(self, general_configs):
+        settings = general_configs["script-settings"]
+        if "timeout" in self.info:
+            return float(self.info["timeout"]) if float(self.info["timeout"]) > 0 else None
+        if settings["run-timeout"] > 0:
+            return float(settings["run-timeout"])
+        if settings["timeout-factor"] <= 0:
+            return None
+        duration = self.history.estimate(self.command_fingerprint()) if self.history is not None else None
+        if duration is None:
+            duration = self.estimate_duration()
+        if duration is None:
+            return None
+        return settings["timeout-factor"] * duration + benchmark.timeout_slack
+
+
+    def journal_complete(self, mode, sample):
+        return self.journal is not None and self.journal.complete(self.suite, self.name, self.active_glob, \
+                mode, sample, self.command_fingerprint())
+
+
+    def journal_record(self, general_configs, mode, sample):
+        if self.journal is not None:
+            outputs = glob.glob(glob.escape(os.path.join(general_configs["paths"]["results-directory"], \
+                    self.active_glob)) + "*")
+            self.journal.record(self.suite, self.name, self.active_glob, mode, sample, self.command_fingerprint(), \
+                    outputs)
+
+
+    def adaptive_metric(self, general_configs):
+        adaptive_metrics = general_configs["script-settings"]["adaptive-metrics"]
+        return adaptive_metrics.get(self.suite, adaptive_metrics["default"])
+
+
+    # Process samples (from a run) on the spot and return the values of metric found in their data
+    # (every sample the run took when none are given)
+    def sample_metrics(self, general_configs, metric, samples=None):
+        execute_glob = self.active_glob
+        self.active_glob = os.path.join(general_configs["paths"]["results-directory"], execute_glob)
+        values = []
+        try:
+            if samples is None:
+                samples = range(self.sample_count(general_configs))
+            units = self.process_units(general_configs)
+            for sample in samples:
+                flattened_data = {}
+                for result_keys, active_name, unit_sample, process_str_order in units:
+                    if unit_sample != sample: continue
+                    data = process_unit(self, general_configs, active_name, sample, process_str_order)
+                    data.pop("histograms", None)
+                    if sample_failed(data): continue
+                    for key, value in flatten_dict(data):
+                        flattened_data["_".join(result_keys + [key])] = value
+                matches = metric_index(flattened_data).lookup(metric.split("_"))
+                if len(matches) > 0 and isinstance(flattened_data[matches[0]], (int, float)):
+                    values.append(flattened_data[matches[0]])
+        finally:
+            self.active_glob = execute_glob
+        return values
+
+
+    # Samples taken for the active glob, as recorded when they ran (the configured count for older runs)
+    def sample_count(self, general_configs):
+        if os.path.exists(self.active_glob + ".samples"):
+            with open(self.active_glob + ".samples", "r") as samples_file:
+                return int(samples_file.read().strip())
+        return general_configs["script-settings"]["samples"]
+
+
     def process_pcm(self, general_configs, sample, data):
         process_errors = 0
         pcm_files = []
         for exe_prefix in general_configs["exe-prefixes"]:
             if "pcm" in exe_prefix and "csv" in general_configs["exe-prefixes"][exe_prefix]:
-                pcm_files.append(self.active_name + "-" + exe_prefix + ".csv")
+                pcm_files.append((exe_prefix, self.active_name + "-" + exe_prefix + ".csv"))
         try:
-            for pcm_file in pcm_files:
+            for exe_prefix, pcm_file in pcm_files:
                 if not os.path.exists(pcm_file):
-                    print_error("PCM CSV file, " + pcm_file + ", was not found to parse"); process_errors += 1; break
-                with open(pcm_file, mode='r') as file:
-                    lines = []
-                    for line in file:
-                        lines.append(line.strip().split(","))
-
-                    for line_number in range(len(lines)):
-                        for item_number in range(len(lines[line_number])):
-                            category = lines[0][item_number]
-                            sub_category = lines[1][item_number]
-                            try:
-                                value = float(lines[2][item_number].strip())
-                            except:
-                                continue
-
-                            if line_number == 0:
-                                if "System" in category:
-                                    if category == "System":
-                                        data["System"][sub_category] = value
-                                    else:
-                                        if category[len("System "):] not in data["System"]:
-                                            data["System"][category[len("System "):]] = {}
-                                        data["System"][category[len("System "):]][sub_category] = value
-
-                                elif "Socket" in category:
-                                    if category.replace("Socket ", "").isdigit():
-                                        data["System"]["Sockets"][category][sub_category] = value
-                                    elif category.split(" (Socket ")[-1][:len(category.split(" (Socket ")[1])-1].isdigit():
-                                        category_socket = category.split(" (Socket ")[-1][:len(category.split(" (Socket ")[1])-1]
-                                        category_nonsocket = category.split(" (Socket ")[0]
-                                        if category_nonsocket not in data["System"]["Sockets"]["Socket " + category_socket]["Cores"]:
-                                            data["System"]["Sockets"]["Socket " + category_socket]["Cores"][category_nonsocket] = {}
-                                        data["System"]["Sockets"]["Socket " + category_socket][\
-                                            "Cores"][category_nonsocket][sub_category] = value
-
-                                elif "SKT" in category:
-                                    cat_split_nums = re.sub('(\d+(\.\d+)?)', r' \1 ', category).strip().split(" ")
-                                    socket = "Socket " + cat_split_nums[1]
-                                    if len(cat_split_nums) > 2:
-                                        data["System"]["Sockets"][socket][" ".join(cat_split_nums[2:])] = {}
-                                        data["System"]["Sockets"][socket][" ".join(cat_split_nums[2:])][sub_category] = value
-                                    else:
-                                        sub_cat_split_nums = re.sub('(\d+(\.\d+)?)', r' \1 ', sub_category).split(" ")
-                                        sub_cat_area = "Channels" if sub_cat_split_nums[0] == "Ch" else \
-                                                            ("iMCs" if sub_cat_split_nums[0] == "iMC" else "Ignore")
-                                        sub_cat_num = ("Channel " + sub_cat_split_nums[1]) if sub_cat_split_nums[0] == "Ch" \
-                                                        else ("iMC " + sub_cat_split_nums[1])
-
-                                        if sub_cat_area != "Ignore":
-                                            if len(sub_cat_split_nums) > 1 and sub_cat_split_nums[1].isdigit() and \
-                                                    sub_cat_num not in data["System"]["Sockets"][socket][sub_cat_area]:
-                                                data["System"]["Sockets"][socket][sub_cat_area][sub_cat_num] = {}
-                                            data["System"]["Sockets"][socket][sub_cat_area][sub_cat_num][\
-                                                " ".join(sub_cat_split_nums[2:]).strip()] = value
-                                        else:
-                                            data["System"]["Sockets"][socket][sub_category] = value
-
-                            elif line_number == 1:
-                                if "SKT" in sub_category and sub_category.replace("SKT", "").isdigit():
-                                    data["System"]["Sockets"]["Socket " + sub_category.replace("SKT", "")][category] = value
+                    # Runs co-scheduled with others do not have system-wide monitors
+                    print_warning("PCM CSV file, " + pcm_file + ", was not found to parse"); continue
+
+                # Summarize every interval into the results and keep the full time series next to them
+                pcm_data = pcm_csv(pcm_file).load()
+                pcm_data.fill(data)
+                pcm_data.save_series(self.active_name + "-" + exe_prefix + ".npz")
         except:
             print_error("Error when processing PCM file"); process_errors += 1
         return process_errors
@@ -216,9 +386,22 @@ class benchmark:
     def process_vmstat(self, general_configs, sample, data):
         with open(self.active_name + ".txt", "r") as fp:
             for line in fp:
-                for vmstat_metric in benchmark.vmstat_metrics:
-                    if vmstat_metric in line:
-                        data["System"][vmstat_metric.replace('_', '-')] = float(line.split(" ")[2].strip())
+                vmstat_metric = line.split(" ")[0]
+                if vmstat_metric in benchmark.vmstat_metrics:
+                    data["System"][vmstat_metric.replace('_', '-')] = float(line.split(" ")[2].strip())
+
+        # Rates and phases of the counters sampled during the run
+        if os.path.exists(self.active_name + "-vmstat.npz"):
+            vmstat_summaries = vmstat_series(self.active_name + "-vmstat.npz").summarize()
+            if len(vmstat_summaries) > 0:
+                data["System"]["vmstat"] = vmstat_summaries
+
+
+    def process_processes(self, general_configs, sample, data):
+        if os.path.exists(self.active_name + "-proc.npz"):
+            process_summaries = process_series(self.active_name + "-proc.npz").summarize()
+            if len(process_summaries) > 0:
+                data["Process"] = process_summaries
 
 
 
@@ -227,25 +410,76 @@ class benchmark:
         print_warning("This benchmark has no specific benchmark results!")
 
 
+    # NOTE: Overwrite this for benchmark suites that export latency histograms!
+    # Returns {category: hdr_histogram} for the active sample
+    def process_histograms(self, general_configs, sample):
+        return {}
+
+
+    # NOTE: Overwrite this along with process_histograms() to derive the suite's latency
+    # metrics (percentiles, min, max, ...) in data from the (merged) histograms
+    def apply_histograms(self, general_configs, data, histograms):
+        return
+
+
+    # Flattened keys of the metrics in data that apply_histograms() derives from the histograms
+    def histogram_keys(self, general_configs, data, histograms):
+        derived_data = nest_dict({key: None for key, value in flatten_dict(data)})
+        self.apply_histograms(general_configs, derived_data, histograms)
+        return [key for key, value in flatten_dict(derived_data) if value is not None]
+
+
     def process_all_monitors(self, general_configs, sample, data):
         self.process_pcm(general_configs, sample, data["general"])
         self.process_vmstat(general_configs, sample, data["general"])
+        self.process_execution(general_configs, sample, data["general"])
+        self.process_processes(general_configs, sample, data["general"])
         self.process_specific(general_configs, sample, data["specific"])
+        histograms = self.process_histograms(general_configs, sample)
+        self.apply_histograms(general_configs, data["specific"], histograms)
+        data["histograms"] = {category: histograms[category].to_dict() for category in histograms}
 
 
 
+    # NOTE: Overwrite this (extending the list) if a benchmark suite parses other raw files!
+    def process_inputs(self, general_configs):
+        inputs = [self.active_name + ".txt", self.active_name + "-vmstat.npz", self.active_name + "-proc.npz"]
+        for exe_prefix in general_configs["exe-prefixes"]:
+            if "pcm" in exe_prefix and "csv" in general_configs["exe-prefixes"][exe_prefix]:
+                inputs.append(self.active_name + "-" + exe_prefix + ".csv")
+        return [path for path in inputs if os.path.exists(path)]
+
+
+    # Config values processing reads (which monitors ran, the parameters parsers depend on, e.g.
+    # memtier's print-percentiles), so changing them invalidates cached samples
+    def process_fingerprint(self, general_configs):
+        configuration = {"exe-prefixes": general_configs["exe-prefixes"], "monitors": general_configs.get("monitors"), \
+                         "parameters": self.raw_parameters, "sockets": host_info().socket_count()}
+        return hashlib.sha1(json.dumps(configuration, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
     def process(self, general_configs, processed_data, sample, process_str_order=[]):
         if len(process_str_order) == 0:
             process_str_order=["Suite=" + self.suite, "Benchmark=" + self.name, "Sample=" + str(sample)]
+
+        # Reuse the sample's data if none of its raw inputs (nor the parsers) changed since last time
+        inputs = self.process_inputs(general_configs)
+        manifest_path = self.active_name + ".manifest.json"
+        version = [self.suite, PROCESS_VERSION, self.process_version, self.process_fingerprint(general_configs)]
+        if general_configs["script-settings"]["process-cache"] and os.path.exists(self.active_name + ".json") and \
+                manifest_is_current(manifest_path, inputs, version):
+            print_step("PROCESS", Fore.MAGENTA, " ".join(process_str_order) + " : Unchanged, using cached data")
+            with open(self.active_name + ".json", "r") as sampled_file:
+                processed_data[str(sample)] = json.load(sampled_file)
+            return
+
         print_step("PROCESS", Fore.MAGENTA, " ".join(process_str_order) + " : Processing all data")
         data = {}
         data["specific"] = {}
         data["general"] = {}
         data["general"]["System"] = {}
         data["general"]["System"]["Sockets"] = {}
-        num_sockets = int(subprocess.check_output('cat /proc/cpuinfo | grep "physical id" | sort -u | wc -l', \
-                            shell=True))
-        for socket in range(num_sockets):
+        for socket in range(host_info().socket_count()):
             data["general"]["System"]["Sockets"]["Socket " + str(socket)] = {}
             data["general"]["System"]["Sockets"]["Socket " + str(socket)]["Cores"] = {}
             data["general"]["System"]["Sockets"]["Socket " + str(socket)]["Channels"] = {}
@@ -254,21 +488,90 @@ class benchmark:
         sampled_file = open(self.active_name + ".json", "w")
         json.dump(data, sampled_file, indent=4)
         sampled_file.close()
+        write_manifest(manifest_path, inputs, version)
         processed_data[str(sample)] = data
 
 
     # NOTE: Overwrite this if needed for each added benchmark suite!
-    def process_wrapper(self, general_configs):
+    # Each unit is (result keys, active name, sample, process string order) and must be
+    # independent of every other unit so they can be processed in parallel
+    def process_units(self, general_configs):
+        units = []
+        for sample in range(self.sample_count(general_configs)):
+            units.append(([], self.active_glob + "-" + str(sample), sample, []))
+        return units
+
+
+    # Statistics of each group's metrics across its samples are added to statistics (when given),
+    # keyed by the group's result keys and then the flattened metric
+    def process_merge(self, general_configs, sampled_data, statistics=None):
+        # Group the data processed from each sample by its result keys (in unit order)
+        grouped_data = {}
+        for result_keys, sample, data in sampled_data:
+            if tuple(result_keys) not in grouped_data:
+                grouped_data[tuple(result_keys)] = {}
+            grouped_data[tuple(result_keys)][str(sample)] = data
+
+        # Average out each group of samples. Histograms are not metrics: they are taken out of each
+        # sample's data and merged instead, and the suite's percentiles are derived from the merge
         processed_data = {}
-        for sample in range(general_configs["script-settings"]["samples"]):
-            self.active_name = self.active_glob + "-" + str(sample)
-            self.process(general_configs, processed_data, sample)
-
-        # Flatten the data processed from each sample
-        processed_data = average_dicts(processed_data)
+        for result_keys in grouped_data:
+            failed_samples = [sample for sample in grouped_data[result_keys] \
+                                if sample_failed(grouped_data[result_keys][sample])]
+            if 0 < len(failed_samples) < len(grouped_data[result_keys]):
+                print_warning("Leaving failed sample(s) " + ", ".join(failed_samples) + " of " + \
+                                "_".join([self.name] + list(result_keys)) + " out of its averages")
+                for sample in failed_samples:
+                    grouped_data[result_keys].pop(sample)
+            merged_histograms = {}
+            for sample in grouped_data[result_keys]:
+                sampled_histograms = grouped_data[result_keys][sample].pop("histograms", {})
+                for category in sampled_histograms:
+                    if category not in merged_histograms:
+                        merged_histograms[category] = hdr_histogram()
+                    merged_histograms[category].add(hdr_histogram(sampled_histograms[category]))
+            group_statistics = aggregate_dicts(grouped_data[result_keys])
+            averaged_data = average_dicts(grouped_data[result_keys], group_statistics)
+            if "general" in averaged_data and "System" in averaged_data["general"]:
+                averaged_data["general"]["System"]["failed-samples"] = len(failed_samples)
+            if statistics is not None:
+                statistics[result_keys] = group_statistics
+            if len(merged_histograms) > 0:
+                if "specific" not in averaged_data:
+                    averaged_data["specific"] = {}
+                self.apply_histograms(general_configs, averaged_data["specific"], merged_histograms)
+
+                # Their spread across samples does not describe the merged value, so they get no error bars
+                for key in self.histogram_keys(general_configs, averaged_data["specific"], merged_histograms):
+                    group_statistics.pop("specific_" + key, None)
+            processed_data = set_nested_value(processed_data, result_keys, averaged_data)
         return processed_data
 
 
+    def process_wrapper(self, general_configs):
+        sampled_data = []
+        for result_keys, active_name, sample, process_str_order in self.process_units(general_configs):
+            sampled_data.append((result_keys, sample, \
+                    process_unit(self, general_configs, active_name, sample, process_str_order)))
+        return self.process_merge(general_configs, sampled_data)
+
+
+
+"""
+Process a single sample of a benchmark (kept at the module level to hand off to a process pool)
+"""
+def process_unit(benchmark_i, general_configs, active_name, sample, process_str_order):
+    processed_data = {}
+    benchmark_i.active_name = active_name
+    benchmark_i.process(general_configs, processed_data, sample, process_str_order)
+    return processed_data[str(sample)]
+
+
+# Samples of runs that failed when executing (timed out, killed) are left out of averages
+def sample_failed(data):
+    return data.get("general", {}).get("System", {}).get("execute-failed", 0.0) > 0
+
+
 
 
 
@@ -280,6 +583,12 @@ Add new benchmarks by creating new classes below!
 
 """""""""""""""""""""""""""""""""""""""""""""""""""""""""
 class tailbench(benchmark):
+    process_version = 2
+    exclusive_directory = True
+    # lats.bin holds one record of (queue, service, sojourn) times in ns (uint64) per measured request
+    latency_types = ["queue", "service", "sojourn"]
+    latency_record_size = 8 * len(latency_types)
+    latency_percentiles = [50, 95, 99, 99.9]
     def __init__(self, name="Null"):
         super().__init__(name, "tailbench")
         self.name = name
@@ -287,9 +596,69 @@ class tailbench(benchmark):
     def add_parameter(self, name, value):
         self.parameters.append("TBENCH_" + name.upper() + "=" + str(value))
 
+    # Networked runs (run_networked.sh) all serve on the default TBENCH port, so they can not co-run
+    @property
+    def concurrent_safe(self):
+        return "networked" not in self.info.get("executable", "") and not self.name.endswith("-networked")
+
+    # The client (integrated) or load generator (networked) needs a core next to the server threads
+    def cpu_demand(self):
+        return int(self.raw_parameters.get("threads", 1)) + 1
+
+    # Requests are sent at the qps rate
+    def estimate_duration(self):
+        if float(self.raw_parameters.get("qps", 0)) <= 0: return None
+        requests = int(self.raw_parameters.get("warmup_reqs", 0)) + int(self.raw_parameters.get("max_reqs", 0))
+        return requests / float(self.raw_parameters["qps"])
+
+    # Tailbench writes lats.bin into its directory, move it next to the sample's other outputs
+    def execute(self, general_configs, sample, start_str_order=[]):
+        lats_file = os.path.join(self.info["path"], "lats.bin")
+        if os.path.exists(lats_file):
+            os.remove(lats_file)
+        super().execute(general_configs, sample, start_str_order)
+        if os.path.exists(lats_file):
+            shutil.move(lats_file, os.path.join(general_configs["paths"]["results-directory"], \
+                                                self.active_name + "-lats.bin"))
+        else:
+            print_warning("Tailbench did not write lats.bin for " + self.name)
+
+    # Reads the records through a memory map, each latency is a strided view over the file
+    def process_specific(self, general_configs, sample, data):
+        lats_file = self.active_name + "-lats.bin"
+        if not os.path.exists(lats_file) or os.path.getsize(lats_file) < tailbench.latency_record_size:
+            print_warning("No request latencies (lats.bin) found for " + self.active_name); return
+        latency_record = np.dtype([(latency_type, np.uint64) for latency_type in tailbench.latency_types])
+        latencies = np.memmap(lats_file, dtype=latency_record, mode="r", \
+                              shape=(os.path.getsize(lats_file) // tailbench.latency_record_size,))
+        data["requests"] = int(latencies.shape[0])
+        for latency_type in tailbench.latency_types:
+            percentiles = np.percentile(latencies[latency_type], tailbench.latency_percentiles) / 1e6
+            data[latency_type + "-latency-(ms)"] = {"mean": float(np.mean(latencies[latency_type], \
+                                                        dtype=np.float64) / 1e6)}
+            for percentile, value in zip(tailbench.latency_percentiles, percentiles):
+                data[latency_type + "-latency-(ms)"]["p" + str(percentile)] = float(value)
+
+        # Achieved rate over the whole run (including warm up requests, so it is a lower bound)
+        with open(self.active_name + ".txt", "r") as fp:
+            for line in fp:
+                if line.startswith("execute-time = ") and float(line.split(" ")[2]) > 0:
+                    data["achieved-qps"] = data["requests"] / float(line.split(" ")[2])
+        del latencies
+
+    def process_inputs(self, general_configs):
+        inputs = super().process_inputs(general_configs)
+        if os.path.exists(self.active_name + "-lats.bin"):
+            inputs.append(self.active_name + "-lats.bin")
+        return inputs
+
 
 
 class ycsb(benchmark):
+    concurrent_safe = False
+    uses_redis = True
+    process_version = 2
+    estimated_throughput = 100000   # Operations per second assumed when there is no history to go by
     def __init__(self, name="Null"):
         super().__init__(name, "ycsb")
         self.analyze_categories = ["load", "run"]
@@ -304,38 +673,109 @@ class ycsb(benchmark):
             if name == "threads": name = "threadcount"
             self.parameters.append("-p " + name + "=" + str(value))
 
+    # 'load' inserts every record, 'run' does half of the operations (see execute_mode)
+    def estimate_duration(self):
+        if "operationcount" not in self.raw_parameters: return None
+        operations = int(self.raw_parameters.get("recordcount", 0)) + int(self.raw_parameters["operationcount"]) // 2
+        return operations / ycsb.estimated_throughput
+
+    # Parameters that change what the 'load' mode puts into the database
+    dataset_parameters = ["database", "workload", "recordcount", "fieldcount", "fieldlength", \
+            "fieldlengthdistribution", "insertorder", "insertstart", "zeropadding"]
+
     def execute_wrapper(self, general_configs):
-        for sample in range(general_configs["script-settings"]["samples"]):
-            if manage_redis(general_configs, "start") > 0:
+        if general_configs["script-settings"]["ycsb-snapshots"]:
+            self.execute_snapshots(general_configs); return
+
+        for sample in self.execute_samples(general_configs):
+            if manage_redis(general_configs, "start", self.exe_prefixes.get("numa", "")) > 0:
                 print_error("Could not start redis-server"); return
 
             # Both modes are needed to execute: 'load' to load into the database, 'run' to execute query operations
             for mode in ["load", "run"]:
-                # Half the operation and record counts for running the benchmark to
-                # make the benchmark run faster for that category
-                modified_parameters = self.parameters.copy()
-                if mode == "run":
-                    half_parameters = ["recordcount", "operationcount"]
-                    for parameter_index in range(len(modified_parameters)):
-                        for half_parameter in half_parameters:
-                            if half_parameter in modified_parameters[parameter_index]:
-                                modified_parameters[parameter_index] = "-p " + half_parameter + "=" + \
-                                        str(int(modified_parameters[parameter_index].split("=")[1]) // 2)
-
-                # Set active name, PCM file outputs, and command, then run!
-                self.active_name = '-'.join([self.active_glob, mode, str(sample)])
-                self.change_pcm_output_csv_files(general_configs, self.active_name)
-                cmd_order = [" ".join(general_configs["exe-prefixes"].values()), \
-                            "./" + self.info["executable"], \
-                            mode, " ".join(modified_parameters)]
-                self.active_cmd = " ".join(cmd_order)
-                start_str_order=["Suite=" + self.suite, "Benchmark=" + self.name, \
-                        "Mode=" + mode, "Sample=" + str(sample), "\nCommand: " + self.active_cmd]
-                self.execute(general_configs, sample, start_str_order)
-
-            if manage_redis(general_configs, "end") > 0:
+                self.execute_mode(general_configs, mode, sample)
+
+            if manage_redis(general_configs, "end", self.exe_prefixes.get("numa", "")) > 0:
                 print_error("Could not kill redis-server"); return
 
+
+    # Load each distinct dataset once into an RDB snapshot (shared by every workload with the same redis
+    # version and dataset parameters), then restore it on the run's NUMA binding before each 'run' sample
+    def execute_snapshots(self, general_configs):
+        numa_prefix = self.exe_prefixes.get("numa", "")
+        snapshot = self.snapshot_path(general_configs)
+        snapshot_arguments = ["--dir", os.path.dirname(snapshot), "--dbfilename", os.path.basename(snapshot), \
+                              "--save", "''", "--appendonly", "no"]
+        create_snapshot = not os.path.exists(snapshot)
+        measure_load = general_configs["script-settings"]["ycsb-measure-load"] and not self.journal_complete("load", 0)
+        if create_snapshot or measure_load:
+            self.run_failed = False
+            os.makedirs(os.path.dirname(snapshot), exist_ok=True)
+            server_arguments = snapshot_arguments if create_snapshot else ["--save", "''"]
+            if manage_redis(general_configs, "start", numa_prefix, server_arguments) > 0:
+                print_error("Could not start redis-server"); return
+            self.execute_mode(general_configs, "load", 0)
+
+            # A failed load would leave a partial dataset that every later run restores
+            if create_snapshot and (self.run_failed or manage_redis(general_configs, "save") > 0):
+                print_error("Could not create the YCSB dataset snapshot " + snapshot + ", skipping " + self.name)
+                manage_redis(general_configs, "shutdown")
+                if os.path.exists(snapshot):
+                    os.remove(snapshot)
+                return
+            manage_redis(general_configs, "end", numa_prefix)
+            if not self.run_failed:
+                self.journal_record(general_configs, "load", 0)
+        else:
+            print_step("TOOLS", Fore.CYAN, "Reusing YCSB dataset snapshot " + snapshot)
+
+        for sample in self.execute_samples(general_configs):
+            if manage_redis(general_configs, "start", numa_prefix, snapshot_arguments) > 0:
+                print_error("Could not restore redis-server from " + snapshot); return
+            self.execute_mode(general_configs, "run", sample)
+            if manage_redis(general_configs, "end", numa_prefix) > 0:
+                print_error("Could not kill redis-server"); return
+
+
+    def dataset_fingerprint(self, general_configs):
+        dataset = {name: str(self.raw_parameters[name]) for name in ycsb.dataset_parameters \
+                        if name in self.raw_parameters}
+        dataset["redis-version"] = redis_server.version(general_configs)
+        return hashlib.sha1(json.dumps(dataset, sort_keys=True).encode()).hexdigest()[:16]
+
+
+    # Snapshots live next to the suite's benchmarks (<output directory>/ycsb/snapshots) so they survive re-runs
+    def snapshot_path(self, general_configs):
+        suite_directory = os.path.dirname(os.path.dirname(os.path.dirname(self.active_glob)))
+        return os.path.abspath(os.path.join(general_configs["paths"]["results-directory"], suite_directory, \
+                                "snapshots", self.dataset_fingerprint(general_configs) + ".rdb"))
+
+
+    def execute_mode(self, general_configs, mode, sample):
+        # Half the operation and record counts for running the benchmark to
+        # make the benchmark run faster for that category
+        modified_parameters = self.parameters.copy()
+        if mode == "run":
+            half_parameters = ["recordcount", "operationcount"]
+            for parameter_index in range(len(modified_parameters)):
+                for half_parameter in half_parameters:
+                    if half_parameter in modified_parameters[parameter_index]:
+                        modified_parameters[parameter_index] = "-p " + half_parameter + "=" + \
+                                str(int(modified_parameters[parameter_index].split("=")[1]) // 2)
+
+        # Set active name, PCM file outputs, and command, then run!
+        self.active_name = '-'.join([self.active_glob, mode, str(sample)])
+        self.change_pcm_output_csv_files(general_configs, self.active_name)
+        modified_parameters += ["-p hdrhistogram.fileoutput=true", "-p hdrhistogram.output.path=" + \
+                os.path.abspath(os.path.join(general_configs["paths"]["results-directory"], self.active_name)) + "-hdr-"]
+        cmd_order = [" ".join(self.exe_prefixes.values()), \
+                    "./" + self.info["executable"], \
+                    mode, " ".join(modified_parameters)]
+        self.active_cmd = " ".join(cmd_order)
+        start_str_order=["Suite=" + self.suite, "Benchmark=" + self.name, \
+                "Mode=" + mode, "Sample=" + str(sample), "\nCommand: " + self.active_cmd]
+        self.execute(general_configs, sample, start_str_order)
+
     def process_specific(self, general_configs, sample, data):
         process_categories = ["OVERALL", "INSERT", "UPDATE", "READ", "UPDATE", "READ-MODIFY-WRITE"]
         with open(self.active_name + ".txt", "r") as fp:
@@ -343,31 +783,59 @@ class ycsb(benchmark):
                 line_splits = line.split(" ")
                 line_splits = [i for i in line_splits if i]
                 for process_category in process_categories:
-                    if process_category in line:
+                    if "[" + process_category + "]" in line:
                         if process_category not in data:
                             data[process_category] = {}
                         data[process_category][line_splits[1].replace(',', '')] = float(line_splits[2])
 
-    def process_wrapper(self, general_configs):
-        processed_data = {}
-        original_glob = self.active_glob
+    # Latency histograms of each operation, written by YCSB as <active name>-hdr-<OPERATION>.hdr
+    def process_histograms(self, general_configs, sample):
+        histograms = {}
+        for histogram_file in glob.glob(glob.escape(self.active_name) + "-hdr-*.hdr"):
+            category = histogram_file[len(self.active_name + "-hdr-"):-len(".hdr")]
+            try:
+                histograms[category] = read_histogram_log(histogram_file)
+            except (ValueError, OSError, zlib.error):
+                print_warning("Could not read latency histogram " + histogram_file)
+        return histograms
+
+    def apply_histograms(self, general_configs, data, histograms):
+        for category in histograms:
+            if category not in data or histograms[category].total() == 0: continue
+            for key in data[category]:
+                percentile = re.fullmatch(r"([0-9.]+)(st|nd|rd|th)?PercentileLatency\(us\)", key)
+                if percentile is not None:
+                    data[category][key] = float(histograms[category].value_at_percentile(float(percentile.group(1))))
+            for key, value in [("MinLatency(us)", histograms[category].min()), \
+                    ("MaxLatency(us)", histograms[category].max()), \
+                    ("AverageLatency(us)", round(histograms[category].mean(), 2))]:
+                if key in data[category]:
+                    data[category][key] = float(value)
+
+    def process_inputs(self, general_configs):
+        return super().process_inputs(general_configs) + sorted(glob.glob(glob.escape(self.active_name) + "-hdr-*.hdr"))
+
+    def process_units(self, general_configs):
+        units = []
         for mode in ["load", "run"]:
-            processed_data[mode] = {}
-            self.active_glob = '-'.join([original_glob, mode])
-            for sample in range(general_configs["script-settings"]["samples"]):
+            for sample in range(self.sample_count(general_configs)):
+                # With dataset snapshots the 'load' mode is measured at most once
+                if mode == "load" and not os.path.exists('-'.join([self.active_glob, mode, str(sample)]) + ".txt"):
+                    continue
                 process_str_order=["Suite=" + self.suite, "Benchmark=" + self.name, "mode=" + mode, \
                                     "Sample=" + str(sample)]
-                self.active_name = '-'.join([self.active_glob, str(sample)])
-                self.process(general_configs, processed_data[mode], sample, process_str_order)
-            # Flatten the data processed from each sample
-            processed_data[mode] = average_dicts(processed_data[mode])
-
-        self.active_glob = original_glob
-        return processed_data
+                units.append(([mode], '-'.join([self.active_glob, mode, str(sample)]), sample, process_str_order))
+        return units
 
 
 
 class memtier(benchmark):
+    concurrent_safe = False
+    uses_redis = True
+    process_version = 3
+    categories = ["Sets", "Gets", "Totals"]
+    # Histogram files (<prefix>_<name>_<run>.txt/.hgrm) and the statistics category they hold
+    histogram_categories = {"FULL_RUN": "Totals", "SET_command": "Sets", "GET_command": "Gets"}
     def __init__(self, name="Null"):
         super().__init__(name, "memtier")
         self.name = name
@@ -377,22 +845,125 @@ class memtier(benchmark):
         else: self.parameters.append("--" + name + "=" + str(value))
 
     def execute_wrapper(self, general_configs):
-        for sample in range(general_configs["script-settings"]["samples"]):
-            if manage_redis(general_configs, "start") > 0:
+        for sample in self.execute_samples(general_configs):
+            if manage_redis(general_configs, "start", self.exe_prefixes.get("numa", "")) > 0:
                 print_error("Could not start redis-server"); return
 
             # Set active name, PCM file outputs, and command, then run!
             self.active_name = self.active_glob + "-" + str(sample)
             self.change_pcm_output_csv_files(general_configs, self.active_name)
-            cmd_order = [" ".join(general_configs["exe-prefixes"].values()), \
+            hdr_prefix = os.path.abspath(os.path.join(general_configs["paths"]["results-directory"], \
+                                self.active_name)) + "-hdr"
+            cmd_order = [" ".join(self.exe_prefixes.values()), \
                         "./" + self.info["executable"], \
-                        " ".join(self.parameters)]
+                        " ".join(self.parameters), "--hdr-file-prefix=" + hdr_prefix, \
+                        "--json-out-file=" + os.path.abspath(os.path.join(\
+                            general_configs["paths"]["results-directory"], self.active_name)) + "-memtier.json"]
             self.active_cmd = " ".join(cmd_order)
             self.execute(general_configs, sample)
 
-            if manage_redis(general_configs, "end") > 0:
+            if manage_redis(general_configs, "end", self.exe_prefixes.get("numa", "")) > 0:
                 print_error("Could not kill redis-server"); return
 
+    # Statistics of every operation type (Sets, Gets, Totals) from the JSON output, or scraped from
+    # the ALL STATS table memtier prints when there is no JSON output
+    def process_specific(self, general_configs, sample, data):
+        all_stats = {}
+        if os.path.exists(self.active_name + "-memtier.json"):
+            try:
+                with open(self.active_name + "-memtier.json", "r") as json_file:
+                    json_output = json.load(json_file)
+                for stats_name in json_output:
+                    if stats_name == "ALL STATS" or stats_name.startswith("AGGREGATED AVERAGE RESULTS"):
+                        all_stats = json_output[stats_name]
+            except (ValueError, OSError):
+                print_warning("Could not read memtier's JSON output, falling back to its text output")
+        if len(all_stats) > 0:
+            self.process_json_stats(all_stats, data)
+        else:
+            self.process_text_stats(data)
+
+    def process_json_stats(self, all_stats, data):
+        latency_names = {"Latency": "average-latency-(ms)", "Average Latency": "average-latency-(ms)", \
+                         "Min Latency": "min-latency-(ms)", "Max Latency": "max-latency-(ms)"}
+        for category in memtier.categories:
+            if category not in all_stats: continue
+            data[category] = {}
+            for stat in all_stats[category]:
+                if stat in ["Ops/sec", "Hits/sec", "Misses/sec", "KB/sec", "Count"]:
+                    data[category][stat] = float(all_stats[category][stat])
+                elif stat in latency_names:
+                    data[category][latency_names[stat]] = float(all_stats[category][stat])
+                elif stat == "Percentile Latencies":
+                    for percentile in all_stats[category][stat]:
+                        percentile_value = re.fullmatch(r"p([0-9.]+)", percentile)
+                        if percentile_value is None: continue
+                        data[category]["p" + "%.2f" % float(percentile_value.group(1)) + "-latency-(ms)"] = \
+                                float(all_stats[category][stat][percentile])
+
+    def process_text_stats(self, data):
+        columns = []
+        with open(self.active_name + ".txt", "r") as fp:
+            for line in fp:
+                if line.startswith("Type "):
+                    columns = []
+                    for column in re.split(r"\s{2,}", line.strip())[1:]:
+                        percentile = re.fullmatch(r"p([0-9.]+) Latency", column)
+                        if percentile is not None:
+                            columns.append("p" + "%.2f" % float(percentile.group(1)) + "-latency-(ms)")
+                        elif column in ["Latency", "Avg. Latency"]:
+                            columns.append("average-latency-(ms)")
+                        else:
+                            columns.append(column)
+                    continue
+                line_splits = line.split()
+                if len(columns) == 0 or len(line_splits) == 0 or line_splits[0] not in memtier.categories:
+                    continue
+                data[line_splits[0]] = {}
+                for column, value in zip(columns, line_splits[1:]):
+                    if value != "---":
+                        data[line_splits[0]][column] = float(value)
+
+    # Histogram logs (.txt, in us) hold every recorded latency, the percentile distributions
+    # (.hgrm, in ms) are only used when there is no log. Every run of a sample is merged
+    def process_histograms(self, general_configs, sample):
+        histograms = {}
+        for histogram_file in sorted(glob.glob(glob.escape(self.active_name) + "-hdr_*.hgrm")):
+            histogram_name = histogram_file[len(self.active_name + "-hdr_"):-len(".hgrm")]
+            category = [memtier.histogram_categories[name] for name in memtier.histogram_categories \
+                            if histogram_name.startswith(name)]
+            if len(category) == 0: continue
+            try:
+                if os.path.exists(histogram_file[:-len(".hgrm")] + ".txt"):
+                    histogram = read_histogram_log(histogram_file[:-len(".hgrm")] + ".txt")
+                else:
+                    histogram = read_percentile_distribution(histogram_file, 1000.0)
+            except (ValueError, OSError, zlib.error):
+                print_warning("Could not read latency histogram " + histogram_file); continue
+            if category[0] not in histograms:
+                histograms[category[0]] = hdr_histogram()
+            histograms[category[0]].add(histogram)
+        return histograms
+
+    def apply_histograms(self, general_configs, data, histograms):
+        percentiles = str(self.raw_parameters.get("print-percentiles", "50,99,99.9")).split(",")
+        for category in histograms:
+            if histograms[category].total() == 0: continue
+            if category not in data:
+                data[category] = {}
+            for percentile in percentiles:
+                data[category]["p" + "%.2f" % float(percentile) + "-latency-(ms)"] = \
+                        histograms[category].value_at_percentile(float(percentile)) / 1000.0
+            data[category]["min-latency-(ms)"] = histograms[category].min() / 1000.0
+            data[category]["max-latency-(ms)"] = histograms[category].max() / 1000.0
+            data[category]["average-latency-(ms)"] = round(histograms[category].mean() / 1000.0, 3)
+
+    def process_inputs(self, general_configs):
+        inputs = super().process_inputs(general_configs) + sorted(glob.glob(glob.escape(self.active_name) + "-hdr_*"))
+        if os.path.exists(self.active_name + "-memtier.json"):
+            inputs.append(self.active_name + "-memtier.json")
+        return inputs
+
 
 
 class pmbench(benchmark):
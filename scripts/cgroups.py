@@ -0,0 +1,130 @@
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+Memory capacity through cgroups
+===================================================
+Filename: cgroups.py
+Author: Reese Kuper
+Purpose: Run benchmarks in transient cgroup v2
+groups that limit their memory capacity and nodes,
+instead of offlining memory blocks through sysfs
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+
+import os
+import re
+import subprocess
+from backends import *
+
+
+
+"""
+Capacity parsing: Sizes like 512M, 8G or 1.5T (powers of 1024), plain bytes, or 'max' for no limit
+"""
+capacity_units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+def parse_capacity(capacity):
+    if str(capacity).strip().lower() == "max":
+        return "max"
+    capacity_match = re.fullmatch(r"([0-9.]+)\s*([KMGT]?)I?B?", str(capacity).strip().upper())
+    if capacity_match is None:
+        return None
+    return str(int(float(capacity_match.group(1)) * capacity_units[capacity_match.group(2)]))
+
+
+
+"""
+Capacity cgroup: A transient cgroup under <cgroup root>/numa-benchmarks holding one run, with
+cpuset.mems limited to the run's memory nodes (if any) and memory.max to its capacity. Processes
+join it through a shell prefix that writes its own PID to cgroup.procs before exec'ing the command,
+so the benchmark and everything it starts (e.g. its redis-server) are charged to it.
+NOTE: Mainline kernels only limit a cgroup's total memory, there is no per-node limit. A capacity
+limits the local node only when the run is bound to it (spilling to other nodes needs offlining)
+"""
+class capacity_cgroup:
+    root = "/sys/fs/cgroup"
+    parent = "numa-benchmarks"
+    controllers = ["cpuset", "memory"]
+    def __init__(self, name, mem_nodes, capacity):
+        self.name = name
+        self.mem_nodes = mem_nodes
+        self.capacity = parse_capacity(capacity)
+        self.path = os.path.join(capacity_cgroup.root, capacity_cgroup.parent, name)
+
+
+    # Returns the number of errors found with the host's cgroup setup
+    @staticmethod
+    def check_host(name):
+        controllers_file = os.path.join(capacity_cgroup.root, "cgroup.controllers")
+        if not os.path.exists(controllers_file):
+            print_error(name + ": capacity limits need cgroup v2 mounted at " + capacity_cgroup.root); return 1
+        with open(controllers_file, "r") as controllers_fp:
+            available_controllers = controllers_fp.read().split()
+        missing_controllers = [controller for controller in capacity_cgroup.controllers \
+                                if controller not in available_controllers]
+        if len(missing_controllers) > 0:
+            print_error(name + ": cgroup controller(s) " + ", ".join(missing_controllers) + " not available"); return 1
+        return 0
+
+
+    @staticmethod
+    def write(path, value):
+        return subprocess.run("echo '" + str(value) + "' | sudo tee " + path, shell=True, \
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+
+    # Returns the number of errors hit while setting the cgroup up
+    def create(self):
+        parent_path = os.path.dirname(self.path)
+        enable_controllers = " ".join(["+" + controller for controller in capacity_cgroup.controllers])
+        if subprocess.run(["sudo", "mkdir", "-p", self.path], stdout=subprocess.DEVNULL, \
+                stderr=subprocess.DEVNULL).returncode != 0:
+            print_error("Could not create cgroup " + self.path); return 1
+        errors = 0
+        for subtree_control in [os.path.join(capacity_cgroup.root, "cgroup.subtree_control"), \
+                                os.path.join(parent_path, "cgroup.subtree_control")]:
+            if not capacity_cgroup.write(subtree_control, enable_controllers):
+                print_error("Could not enable " + enable_controllers + " in " + subtree_control); errors += 1
+        if len(self.mem_nodes) > 0 and not capacity_cgroup.write(os.path.join(self.path, "cpuset.mems"), \
+                                     ",".join([str(mem_node) for mem_node in self.mem_nodes])):
+            print_error("Could not limit " + self.name + " to memory node(s) " + str(self.mem_nodes)); errors += 1
+        if not capacity_cgroup.write(os.path.join(self.path, "memory.max"), self.capacity):
+            print_error("Could not limit " + self.name + " to " + str(self.capacity) + " bytes"); errors += 1
+        if self not in capacity_cgroups:
+            capacity_cgroups.append(self)
+        return errors
+
+
+    def prefix(self):
+        return "sudo sh -c 'echo $$ > " + os.path.join(self.path, "cgroup.procs") + "; exec \"$@\"' sh"
+
+
+    def oom_kills(self):
+        try:
+            with open(os.path.join(self.path, "memory.events"), "r") as events_fp:
+                for line in events_fp:
+                    if line.startswith("oom_kill "):
+                        return int(line.split()[1])
+        except (OSError, ValueError):
+            pass
+        return 0
+
+
+    # A cgroup still holding processes (e.g. a reused redis-server) stays until remove_cgroups()
+    def remove(self):
+        if not os.path.isdir(self.path) or subprocess.run(["sudo", "rmdir", self.path], \
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0:
+            if self in capacity_cgroups:
+                capacity_cgroups.remove(self)
+            return True
+        return False
+
+
+capacity_cgroups = []
+
+
+# Removes the cgroups left behind once nothing runs in them anymore
+def remove_cgroups():
+    for cgroup in list(capacity_cgroups):
+        if not cgroup.remove():
+            print_warning("Could not remove cgroup " + cgroup.path + ", processes may still be running in it")
+    parent_path = os.path.join(capacity_cgroup.root, capacity_cgroup.parent)
+    if len(capacity_cgroups) == 0 and os.path.isdir(parent_path):
+        subprocess.run(["sudo", "rmdir", parent_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
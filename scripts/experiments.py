@@ -15,17 +15,15 @@ import sys
 import time
 import datetime
 import argparse
-import yaml
-import numa
 import re
 import json
-import numpy as np
-import matplotlib.pyplot as plt
+import statistics
 from pathlib import Path
-from collections import Counter
 from colorama import Fore, Back, Style
 from backends import *
 from benchmarks import *
+from store import *
+from scheduler import *
 
 
 
@@ -70,38 +68,89 @@ class experiment():
             if operation != "analyze":
                 for benchmark in self.benchmarks_pathing[benchmark_suite]:
                     relative_benchmark_directory = os.path.join(relative_suite_directory, benchmark)
-                    if os.path.exists(relative_benchmark_directory):
-                        if not retain_old and operation != "analyze":
-                            shutil.rmtree(relative_benchmark_directory)
-                    else:
-                        os.mkdir(relative_benchmark_directory)
-                        if operation != "analyze":
-                            os.mkdir(os.path.join(relative_benchmark_directory, "raw"))
+                    if os.path.exists(relative_benchmark_directory) and not retain_old:
+                        shutil.rmtree(relative_benchmark_directory)
+                    os.makedirs(os.path.join(relative_benchmark_directory, "raw"), exist_ok=True)
 
 
     # NOTE: Override to define how to run your experiment
-    def execute(self, general_configs, benchmark):
-        benchmark.active_glob = os.path.join(general_configs["paths"]["results-directory"], \
-            self.output_directory, benchmark.suite, benchmark.name, "raw", benchmark.name)
-        benchmark.execute_wrapper(general_configs)
+    # Returns a job (with its own command prefixes) per configuration to run the benchmark under
+    def execute_jobs(self, general_configs, benchmark):
+        active_glob = os.path.join(self.output_directory, benchmark.suite, benchmark.name, "raw", benchmark.name)
+        return [execution_job(benchmark, general_configs["exe-prefixes"], active_glob)]
 
 
-    def execute_wrapper(self, general_configs):
-        # Save the exe-prefixes: overwritten later for paths and different numa nodes
-        exe_prefixes_before = general_configs["exe-prefixes"].copy()
+    # Every job of the experiment in the order they run. The 'grouped' job-order runs the jobs that
+    # use the redis-server together and, among them, those with the same NUMA configuration back to
+    # back, so servers restart and the host is reconfigured as rarely as possible
+    def ordered_jobs(self, general_configs):
+        jobs = []
         for benchmark_suite in self.benchmark_suites:
             if self.benchmark_suites[benchmark_suite] == []: continue
             for benchmark in self.benchmark_suites[benchmark_suite]:
-                self.execute(general_configs, benchmark)
-        general_configs["exe-prefixes"] = exe_prefixes_before
+                jobs += self.execute_jobs(general_configs, benchmark)
+        if general_configs["script-settings"]["job-order"] == "grouped":
+            configurations = {}
+            for job in jobs:
+                configurations.setdefault(job.configuration(), len(configurations))
+            jobs.sort(key=lambda job: (job.benchmark.uses_redis, configurations[job.configuration()]))
+        elif general_configs["script-settings"]["job-order"] != "yaml":
+            print_warning("Unknown job-order, " + str(general_configs["script-settings"]["job-order"]) + \
+                            ", running jobs in the YAML order")
+        return jobs
+
+
+    # Lists the jobs in the order they would run with their estimated times, returns the total seconds
+    def plan(self, general_configs):
+        settings = general_configs["script-settings"]
+        history = run_history(os.path.join(general_configs["paths"]["results-directory"], "history.json"))
+        max_samples = max(settings["adaptive-max-samples"], settings["samples"]) if settings["adaptive-sampling"] \
+                        else settings["samples"]
+        jobs = self.ordered_jobs(general_configs)
+        print_step("PLAN", Fore.BLUE, self.name + ": " + str(len(jobs)) + " job(s), " + str(settings["samples"]) + \
+                    (" to " + str(max_samples) if max_samples > settings["samples"] else "") + " sample(s) each")
+        total_duration = max_duration = 0.0
+        redis_starts = reconfigurations = 0
+        previous_configuration = previous_redis_configuration = None
+        for job_index, job in enumerate(jobs):
+            duration, source = job.estimate(history)
+            total_duration += duration * settings["samples"] * job.steps()
+            max_duration += duration * max_samples * job.steps()
+            if job.configuration() != previous_configuration:
+                reconfigurations += 1
+                previous_configuration = job.configuration()
+            if job.benchmark.uses_redis:
+                if not settings["redis-reuse"]:
+                    redis_starts += settings["samples"] * job.steps()
+                elif job.configuration() != previous_redis_configuration:
+                    redis_starts += 1
+                previous_redis_configuration = job.configuration()
+            print("    " + str(job_index + 1) + ". " + job.name + ": " + format_duration(duration) + " per sample" + \
+                    (" x " + str(job.steps()) + " steps" if job.steps() > 1 else "") + " (" + source + ")")
+        print("    NUMA configurations: " + str(reconfigurations) + ", redis-server starts: " + str(redis_starts) + \
+                ", estimated time: " + format_duration(total_duration) + \
+                (" (up to " + format_duration(max_duration) + ")" if max_duration > total_duration else ""))
+        return total_duration
+
+
+    def execute_wrapper(self, general_configs):
+        jobs = self.ordered_jobs(general_configs)
+        journal = run_journal(os.path.join(general_configs["paths"]["results-directory"], self.output_directory, \
+                "journal.jsonl"), self.name, general_configs["resume"])
+        history = run_history(os.path.join(general_configs["paths"]["results-directory"], "history.json"))
+        for job in jobs:
+            job.journal = journal
+            job.history = history
+        scheduler(general_configs).run(general_configs, jobs)
+        manage_redis(general_configs, "shutdown")
+        remove_cgroups()
 
 
     # NOTE: Override to define how to process your experiment
-    def process(self, general_configs, complete_results, benchmark):
-        benchmark.active_glob = os.path.join(general_configs["paths"]["results-directory"], \
-            self.output_directory, benchmark.suite, benchmark.name, "raw", benchmark.name)
-        complete_results[benchmark.suite][benchmark.name][mem_config] = \
-                benchmark.process_wrapper(general_configs)
+    # Returns the result keys and raw output glob of every configuration a benchmark was run under
+    def process_globs(self, general_configs, benchmark):
+        return [([], os.path.join(general_configs["paths"]["results-directory"], \
+            self.output_directory, benchmark.suite, benchmark.name, "raw", benchmark.name))]
 
 
     def process_wrapper(self, general_configs):
@@ -109,6 +158,36 @@ class experiment():
         experiment_output_path = os.path.join(\
                 general_configs["paths"]["results-directory"], \
                 self.output_directory)
+
+        # Gather every independent (benchmark, config, mode, sample) unit before processing
+        units = []
+        unit_groups = []
+        for benchmark_suite in self.benchmark_suites:
+            for benchmark in self.benchmark_suites[benchmark_suite]:
+                for config_keys, active_glob in self.process_globs(general_configs, benchmark):
+                    benchmark.active_glob = active_glob
+                    for result_keys, active_name, sample, process_str_order in \
+                            benchmark.process_units(general_configs):
+                        units.append((benchmark, general_configs, active_name, sample, process_str_order))
+                        unit_groups.append(((benchmark.suite, benchmark.name, tuple(config_keys)), \
+                                result_keys, sample))
+        sampled_data = run_units(general_configs["script-settings"]["jobs"], process_unit, units)
+
+        # Merge the processed samples back into the results in the same order as they were gathered,
+        # leaving out (and reporting) the ones that could not be processed
+        grouped_samples = {}
+        failed_units = []
+        for unit, (group, result_keys, sample), (data, reason) in zip(units, unit_groups, sampled_data):
+            if reason is not None:
+                failed_units.append((os.path.relpath(unit[2], general_configs["paths"]["results-directory"]), \
+                        reason)); continue
+            if group not in grouped_samples:
+                grouped_samples[group] = []
+            grouped_samples[group].append((result_keys, sample, data))
+
+        # Every sample and the averaged results also go into the columnar store used by analysis
+        store = results_store(os.path.join(experiment_output_path, self.name + ".db"))
+        store.clear(self.name)
         for benchmark_suite in self.benchmark_suites:
             if self.benchmark_suites[benchmark_suite] == []: continue
             complete_results[benchmark_suite] = {}
@@ -116,36 +195,57 @@ class experiment():
                     self.benchmark_suites[benchmark_suite][0].suite)
             for benchmark in self.benchmark_suites[benchmark_suite]:
                 complete_results[benchmark.suite][benchmark.name] = {}
-                benchmark_output_path = os.path.join(suite_output_path, benchmark.name)
-                self.process(general_configs, complete_results, benchmark)
-                # write_data(complete_results, os.path.join(benchmark_output_path, benchmark.name + ".json"))
+                for config_keys, active_glob in self.process_globs(general_configs, benchmark):
+                    benchmark.active_glob = active_glob
+                    group = (benchmark.suite, benchmark.name, tuple(config_keys))
+                    statistics = {}
+                    merged_data = benchmark.process_merge(general_configs, grouped_samples.get(group, []), statistics)
+                    complete_results[benchmark.suite][benchmark.name] = set_nested_value(\
+                            complete_results[benchmark.suite][benchmark.name], config_keys, merged_data)
+
+                    stored_result_keys = []
+                    for result_keys, sample, data in grouped_samples.get(group, []):
+                        store.write(self.name, benchmark.suite, benchmark.name, "_".join(config_keys), \
+                                "_".join(result_keys), sample, data)
+                        if result_keys not in stored_result_keys:
+                            stored_result_keys.append(result_keys)
+                            store.write(self.name, benchmark.suite, benchmark.name, "_".join(config_keys), \
+                                    "_".join(result_keys), results_store.averaged_sample, \
+                                    get_nested_value(merged_data, result_keys), statistics[tuple(result_keys)])
             write_data(complete_results, os.path.join(suite_output_path, benchmark.suite + ".json"))
         write_data(complete_results, os.path.join(experiment_output_path, self.name + ".json"))
+        store.close()
         self.results = complete_results
+        if len(failed_units) > 0:
+            print_error(str(len(failed_units)) + " sample(s) could not be processed and are left out of the results:")
+            for unit_name, reason in failed_units:
+                print("    " + unit_name + ": " + reason)
 
 
-    def analyze_gather_metric_type_data(self, flattened_results, benchmark_plot_info, \
+    def analyze_gather_metric_type_data(self, results_index, benchmark_plot_info, \
                 benchmark_suite, metric, group, partial_metric_string):
         full_metric_string = partial_metric_string.copy()
         for metric_substring in metric.split('_'):
             full_metric_string.append(metric_substring)
-        used_data_entries = []
-        found_data = False
-        for data_entry in flattened_results:
-            if all(ele in data_entry for ele in full_metric_string) and \
-                    data_entry not in used_data_entries:
-                benchmark_plot_info[benchmark_suite][metric]["data"][group].append(flattened_results[data_entry])
-                used_data_entries.append(data_entry)
-                found_data = True
-                break
-        if not found_data:
+        matches = results_index.lookup(full_metric_string)
+        if len(matches) == 0:
             print_warning("Could not find data for " + "_".join(full_metric_string))
             benchmark_plot_info[benchmark_suite][metric]["data"][group].append(0.0)
-
-
-    def analyze_gather_metrics(self, flattened_results, benchmark_plot_info, benchmark_suite, metric, group):
+            benchmark_plot_info[benchmark_suite][metric]["errors"][group].append(0.0)
+            return
+        if len(matches) > 1:
+            print_warning("Found " + str(len(matches)) + " matches for " + "_".join(full_metric_string) + \
+                            ", using " + matches[0] + " (others: " + ", ".join(matches[1:4]) + \
+                            (", ..." if len(matches) > 4 else "") + ")")
+        benchmark_plot_info[benchmark_suite][metric]["data"][group].append(results_index.results[matches[0]])
+        benchmark_plot_info[benchmark_suite][metric]["errors"][group].append(\
+                results_index.errors.get(matches[0], 0.0))
+
+
+    def analyze_gather_metrics(self, results_index, benchmark_plot_info, benchmark_suite, metric, group):
         benchmark_plot_info[benchmark_suite][metric]["groups"].append(group)
         benchmark_plot_info[benchmark_suite][metric]["data"][group] = []
+        benchmark_plot_info[benchmark_suite][metric]["errors"][group] = []
         for benchmark in self.benchmark_suites[benchmark_suite]:
             for benchmark_category in benchmark.analyze_categories:
                 partial_metric_string = [benchmark.name]
@@ -159,14 +259,14 @@ class experiment():
                 else:
                     benchmark_plot_info[benchmark_suite][metric]["labels"].append(benchmark.name)
 
-                self.analyze_gather_metric_type_data(flattened_results, benchmark_plot_info, \
+                self.analyze_gather_metric_type_data(results_index, benchmark_plot_info, \
                         benchmark_suite, metric, group, partial_metric_string)
 
 
     # NOTE: Implement this per experiment
-    def analyze(self, flattened_results, benchmark_plot_info, benchmark_suite, metric):
+    def analyze(self, results_index, benchmark_plot_info, benchmark_suite, metric):
         for group in ["default"]:
-            self.analyze_gather_metrics(flattened_results, benchmark_plot_info, benchmark_suite, metric, group)
+            self.analyze_gather_metrics(results_index, benchmark_plot_info, benchmark_suite, metric, group)
 
 
     def graph(self, general_configs, benchmark_plot_info, benchmark_suite):
@@ -178,9 +278,11 @@ class experiment():
 
             current_width = 0
             for group in benchmark_plot_info[benchmark_suite][metric]["groups"]:
+                errors = benchmark_plot_info[benchmark_suite][metric]["errors"][group]
                 plt.bar(ind + current_width, \
                         benchmark_plot_info[benchmark_suite][metric]["data"][group], \
-                        width = width, label = group)
+                        width = width, label = group, capsize = 3, \
+                        yerr = errors if any([error > 0 for error in errors]) else None)
                 current_width += width
 
             plt.xlabel(benchmark_suite + " Benchmarks")
@@ -195,28 +297,65 @@ class experiment():
             plt.savefig(graph_path)
 
 
-    def analyze_wrapper(self, general_configs):
-        if "process" not in self.operations:
+    # Metrics analyzed for a suite, only these are loaded from the store
+    def analyzed_metrics(self, benchmark_suite):
+        metrics = []
+        for metric_type in [self.analysis_metrics["general"], self.analysis_metrics["specific"].get(benchmark_suite)]:
+            if metric_type != None:
+                metrics += [metric for metric in metric_type if metric not in metrics]
+        return metrics
+
+
+    # Yields the results index of each suite with results. Queries the columnar store (for the analyzed
+    # metrics only) when available, otherwise falls back to the nested results
+    def analyze_indexes(self, general_configs):
+        store = None
+        store_path = os.path.join(general_configs["paths"]["results-directory"], \
+                                    self.output_directory, self.name + ".db")
+        if os.path.exists(store_path):
+            store = results_store(store_path)
+        elif "process" not in self.operations:
             print_warning("Results not actively loaded, attempting to restore from .json file")
             results_path = os.path.join(general_configs["paths"]["results-directory"], \
-                                        self.name, self.name + ".json")
+                                        self.output_directory, self.name + ".json")
             if not os.path.exists(results_path):
                 print_error("Could not find " + self.name + ".json"); return
             self.results = json.load(open(results_path,))
 
+        try:
+            for benchmark_suite in self.benchmark_suites:
+                # Error bars (the spread across samples) are only kept in the store
+                flattened_errors = {}
+                if store != None:
+                    metrics = self.analyzed_metrics(benchmark_suite)
+                    flattened_results = store.flattened(self.name, benchmark_suite, metrics=metrics)
+                    if len(flattened_results) == 0: continue
+                    if general_configs["graph-settings"]["error-bars"] in results_store.statistic_columns:
+                        flattened_errors = store.flattened(self.name, benchmark_suite, metrics=metrics, \
+                                column=general_configs["graph-settings"]["error-bars"])
+                else:
+                    if (benchmark_suite not in self.results): continue
+                    flattened_results = { k:v for k,v in flatten_dict(self.results[benchmark_suite]) }
+                yield benchmark_suite, metric_index(flattened_results, flattened_errors)
+        finally:
+            if store != None:
+                store.close()
+
+
+    def analyze_wrapper(self, general_configs):
         benchmark_plot_info = {}
-        for benchmark_suite in self.benchmark_suites:
-            if (benchmark_suite not in self.results): continue
-            flattened_results = { k:v for k,v in flatten_dict(self.results[benchmark_suite]) }
+        for benchmark_suite, results_index in self.analyze_indexes(general_configs):
             benchmark_plot_info[benchmark_suite] = {}
             if self.analysis_metrics["general"] != None:
                 for metric in self.analysis_metrics["general"]:
-                    benchmark_plot_info[benchmark_suite][metric] = {"groups" : [], "labels" : [], "data" : {}}
-                    self.analyze(flattened_results, benchmark_plot_info, benchmark_suite, metric)
+                    benchmark_plot_info[benchmark_suite][metric] = {"groups" : [], "labels" : [], "data" : {}, \
+                                                                    "errors" : {}}
+                    self.analyze(results_index, benchmark_plot_info, benchmark_suite, metric)
             if self.analysis_metrics["specific"][benchmark_suite] != None:
                 for metric in self.analysis_metrics["specific"][benchmark_suite]:
-                    benchmark_plot_info[benchmark_suite][metric] = {"groups" : [], "labels" : [], "data" : {}}
-                    self.analyze(flattened_results, benchmark_plot_info, benchmark_suite, metric)
+                    benchmark_plot_info[benchmark_suite][metric] = {"groups" : [], "labels" : [], "data" : {}, \
+                                                                    "errors" : {}}
+                    self.analyze(results_index, benchmark_plot_info, benchmark_suite, metric)
 
             for metric in benchmark_plot_info[benchmark_suite]:
                 labels = []
@@ -238,60 +377,249 @@ Add new benchmarks by creating new classes below!
 class numa_mode_compare(experiment):
     def __init__(self, name="Null"):
         super().__init__(name)
-        pass
+        self.mem_configs = []
+        self.mem_policy_specs = {}
 
     def init_config(self, config_name, config):
         errors = 0
         if config_name == "numa-node-configs":
             self.small_cpu_node = config["small-cpu-node"]
-            if config["small-cpu-node"] > numa.info.get_max_node():
+            if config["small-cpu-node"] > host_info().max_node():
                 print_error("small-cpu-node not in range of available NUMA nodes"); errors += 1
             self.small_mem_node = config["small-mem-node"]
-            if config["small-cpu-node"] > numa.info.get_max_node():
+            if config["small-mem-node"] > host_info().max_node():
                 print_error("small-mem-node not in range of available NUMA nodes"); errors += 1
             self.big_cpu_node = config["big-cpu-node"]
-            if config["small-cpu-node"] > numa.info.get_max_node():
+            if config["big-cpu-node"] > host_info().max_node():
                 print_error("big-cpu-node not in range of available NUMA nodes"); errors += 1
             self.big_mem_node = config["big-mem-node"]
-            if config["small-cpu-node"] > numa.info.get_max_node():
+            if config["big-mem-node"] > host_info().max_node():
                 print_error("big-mem-node not in range of available NUMA nodes"); errors += 1
         elif config_name == "numa-mem-configs":
-            self.mem_configs = config
+            # Either names of the legacy placements (local, remote, both) or policy specs by name
+            self.mem_configs = list(config)
+            self.mem_policy_specs = config if isinstance(config, dict) else {}
+            for mem_config in self.mem_policy_specs:
+                if "_" in str(mem_config):
+                    print_error("Memory config names can not hold '_': " + str(mem_config)); errors += 1
+                if not isinstance(self.mem_policy_specs[mem_config], dict):
+                    print_error("Memory config " + str(mem_config) + " needs a policy spec"); errors += 1; continue
+                errors += mem_policy.from_spec(mem_config, self.mem_policy_specs[mem_config]).validate()
+            for mem_config in [mem_config for mem_config in self.mem_configs if mem_config not in \
+                                self.mem_policy_specs and mem_config not in ["local", "remote", "both"]]:
+                print_error("Unknown memory config " + str(mem_config) + ", use local, remote, both, " + \
+                            "or give its policy spec"); errors += 1
         return errors
 
 
-    def execute(self, general_configs, benchmark):
-        for mem_config in self.mem_configs:
+    # The legacy placements are bindings based on the experiment's node configurations
+    def mem_policy(self, mem_config):
+        if mem_config in self.mem_policy_specs:
+            return mem_policy.from_spec(mem_config, self.mem_policy_specs[mem_config])
+        if mem_config == "local":
+            return mem_policy(mem_config, [self.big_cpu_node], [self.big_mem_node])
+        elif mem_config == "remote":
+            return mem_policy(mem_config, [self.small_cpu_node], [self.big_mem_node])
+        return mem_policy(mem_config, [self.small_cpu_node], [self.small_mem_node, self.big_mem_node])
 
-            # Set up execution prefixes based on default values in general configs (can be overriden)
-            if "numa" in general_configs["exe-prefixes"]:
-                if mem_config == "local":
-                    cpu_node = str(self.big_cpu_node)
-                    mem_node = str(self.big_mem_node)
-                elif mem_config == "remote":
-                    cpu_node = str(self.small_cpu_node)
-                    mem_node = str(self.big_mem_node)
-                else:
-                    cpu_node = str(self.small_cpu_node)
-                    mem_node = str(self.small_mem_node) + "," + str(self.big_mem_node)
-            general_configs["exe-prefixes"]["numa"] = "sudo numactl --cpunodebind=" + str(cpu_node) + \
-                    " --membind=" + str(mem_node)
 
+    def execute_jobs(self, general_configs, benchmark):
+        jobs = []
+        for mem_config in self.mem_configs:
+            policy = self.mem_policy(mem_config)
             output_glob_order = "-".join([mem_config, benchmark.name])
-            benchmark.active_glob = os.path.join(self.output_directory, \
+            active_glob = os.path.join(self.output_directory, \
                     benchmark.suite, benchmark.name, "raw", output_glob_order)
-            benchmark.execute_wrapper(general_configs)
+            jobs.append(execution_job(benchmark, general_configs["exe-prefixes"], active_glob, \
+                    policy.cpu_nodes, policy.mem_args(), benchmark.name + " (" + mem_config + ")", policy))
+        return jobs
 
 
-    def process(self, general_configs, complete_results, benchmark):
+    def process_globs(self, general_configs, benchmark):
+        process_globs = []
         for mem_config in self.mem_configs:
             output_glob_order = [mem_config, benchmark.name]
-            benchmark.active_glob = os.path.join(general_configs["paths"]["results-directory"], \
-                    self.output_directory, benchmark.suite, benchmark.name, "raw", "-".join(output_glob_order))
-            complete_results[benchmark.suite][benchmark.name][mem_config] = \
-                    benchmark.process_wrapper(general_configs)
+            process_globs.append(([mem_config], os.path.join(general_configs["paths"]["results-directory"], \
+                    self.output_directory, benchmark.suite, benchmark.name, "raw", "-".join(output_glob_order))))
+        return process_globs
 
 
-    def analyze(self, flattened_results, benchmark_plot_info, benchmark_suite, metric):
+    def analyze(self, results_index, benchmark_plot_info, benchmark_suite, metric):
         for group in self.mem_configs:
-            self.analyze_gather_metrics(flattened_results, benchmark_plot_info, benchmark_suite, metric, group)
+            self.analyze_gather_metrics(results_index, benchmark_plot_info, benchmark_suite, metric, group)
+
+
+
+"""
+Sweep job: Runs a benchmark once per value of the swept parameter (each step in its own glob),
+stopping early once the step's tail latency exceeds the SLO
+"""
+class sweep_job(execution_job):
+    def __init__(self, benchmark, exe_prefixes, active_glob, cpu_nodes=None, mem_args="", name="", policy=None, \
+                 parameter="qps", values=None, slo=None, latency_metric=""):
+        super().__init__(benchmark, exe_prefixes, active_glob, cpu_nodes, mem_args, name, policy)
+        self.sweep_glob = active_glob
+        self.parameter = parameter
+        self.values = values if values is not None else []
+        self.slo = slo
+        self.latency_metric = latency_metric
+
+
+    # Averaged over the steps, each of which has its own history
+    def estimate(self, history):
+        durations = []
+        sources = []
+        for value in self.values:
+            self.benchmark.override_parameter(self.parameter, value)
+            duration, source = super().estimate(history)
+            durations.append(duration)
+            sources.append(source)
+        return float(statistics.mean(durations)), max(set(sources), key=sources.count)
+
+
+    def steps(self):
+        return len(self.values)
+
+
+    def run(self, general_configs):
+        for value in self.values:
+            self.benchmark.override_parameter(self.parameter, value)
+            self.active_glob = self.sweep_glob + "-" + load_sweep.step_name(self.parameter, value)
+            super().run(general_configs)
+            if self.slo is None or self.latency_metric == "": continue
+
+            latencies = self.benchmark.sample_metrics(general_configs, self.latency_metric)
+            if len(latencies) == 0:
+                print_warning("Could not find " + self.latency_metric + " for " + self.name + \
+                                ", can not check it against the SLO"); continue
+            if statistics.mean(latencies) > self.slo:
+                print_step("SWEEP", Fore.BLUE, self.name + " exceeded the SLO (" + self.latency_metric + " = " + \
+                            str(round(statistics.mean(latencies), 3)) + " > " + str(self.slo) + ") at " + \
+                            self.parameter + "=" + str(value) + ", stopping its sweep")
+                break
+
+
+
+"""
+Load sweep: Sweeps a benchmark parameter (qps, threads, clients, pipeline, ...) over a range of
+values under each NUMA memory config and graphs the suite's tail latency against its achieved
+throughput, one curve per config
+"""
+class load_sweep(numa_mode_compare):
+    def __init__(self, name="Null"):
+        super().__init__(name)
+        self.parameter = "qps"
+        self.values = []
+        self.slo = None
+        self.latency_metrics = {}
+        self.throughput_metrics = {}
+
+    def init_config(self, config_name, config):
+        errors = 0
+        if config_name == "sweep":
+            self.parameter = config["parameter"]
+            self.values = config["values"]
+            self.slo = config.get("slo")
+            self.latency_metrics = config.get("latency-metrics") or {}
+            self.throughput_metrics = config.get("throughput-metrics") or {}
+            if not isinstance(self.values, list) or len(self.values) == 0:
+                print_error("A load sweep needs a list of values to sweep " + str(self.parameter) + " over")
+                errors += 1
+        else:
+            errors += super().init_config(config_name, config)
+        return errors
+
+
+    # Results keys can not hold '_' (it separates the flattened keys)
+    @staticmethod
+    def step_name(parameter, value):
+        return (str(parameter) + "-" + str(value)).replace("_", "-")
+
+
+    def execute_jobs(self, general_configs, benchmark):
+        if self.parameter not in benchmark.raw_parameters:
+            print_warning(benchmark.name + " has no " + str(self.parameter) + " parameter, it is swept anyway")
+        jobs = []
+        for job in super().execute_jobs(general_configs, benchmark):
+            jobs.append(sweep_job(benchmark, general_configs["exe-prefixes"], job.active_glob, job.cpu_nodes, \
+                    job.mem_args, job.name, job.policy, self.parameter, self.values, self.slo, \
+                    self.latency_metrics.get(benchmark.suite, "")))
+        return jobs
+
+
+    # Steps cut short by the SLO were never run (every run records the samples it took)
+    def process_globs(self, general_configs, benchmark):
+        process_globs = []
+        for config_keys, active_glob in super().process_globs(general_configs, benchmark):
+            for value in self.values:
+                step_glob = active_glob + "-" + load_sweep.step_name(self.parameter, value)
+                if os.path.exists(step_glob + ".samples"):
+                    process_globs.append((config_keys + [load_sweep.step_name(self.parameter, value)], step_glob))
+        return process_globs
+
+
+    def analyze_step_value(self, results_index, metric_segments):
+        matches = results_index.lookup(metric_segments)
+        if len(matches) == 0:
+            return None
+        return results_index.results[matches[0]]
+
+
+    # Curves of each metric (the suite's latency and analysis metrics) against the achieved throughput
+    def analyze_wrapper(self, general_configs):
+        for benchmark_suite, results_index in self.analyze_indexes(general_configs):
+            if benchmark_suite not in self.throughput_metrics:
+                print_warning("No throughput metric to sweep " + benchmark_suite + " against"); continue
+            metrics = [self.latency_metrics[benchmark_suite]] if benchmark_suite in self.latency_metrics else []
+            for metric_type in [self.analysis_metrics["general"], \
+                                self.analysis_metrics["specific"].get(benchmark_suite)]:
+                if metric_type != None:
+                    metrics += [metric for metric in metric_type if metric not in metrics]
+
+            for benchmark in self.benchmark_suites[benchmark_suite]:
+                for metric in metrics:
+                    curves = {}
+                    for mem_config in self.mem_configs:
+                        curves[mem_config] = []
+                        for value in self.values:
+                            step_segments = [benchmark.name, mem_config, load_sweep.step_name(self.parameter, value)]
+                            throughput = self.analyze_step_value(results_index, \
+                                    step_segments + self.throughput_metrics[benchmark_suite].split("_"))
+                            metric_value = self.analyze_step_value(results_index, step_segments + metric.split("_"))
+                            if throughput is not None and metric_value is not None:
+                                curves[mem_config].append((throughput, metric_value, value))
+                    self.graph_curves(general_configs, benchmark_suite, benchmark.name, metric, curves)
+
+
+    # Also loads the latency metric and the throughput metric the curves are plotted against
+    def analyzed_metrics(self, benchmark_suite):
+        metrics = [self.latency_metrics[benchmark_suite]] if benchmark_suite in self.latency_metrics else []
+        metrics += [metric for metric in super().analyzed_metrics(benchmark_suite) if metric not in metrics]
+        if benchmark_suite in self.throughput_metrics and self.throughput_metrics[benchmark_suite] not in metrics:
+            metrics.append(self.throughput_metrics[benchmark_suite])
+        return metrics
+
+
+    def graph_curves(self, general_configs, benchmark_suite, benchmark_name, metric, curves):
+        plt.figure(figsize=(general_configs["graph-settings"]["width"], \
+                            general_configs["graph-settings"]["height"]))
+        for mem_config in curves:
+            if len(curves[mem_config]) == 0: continue
+            plt.plot([point[0] for point in curves[mem_config]], [point[1] for point in curves[mem_config]], \
+                     marker="o", label=mem_config)
+            for throughput, metric_value, value in curves[mem_config]:
+                plt.annotate(str(value), (throughput, metric_value), textcoords="offset points", xytext=(0, 5))
+        if self.slo is not None and metric == self.latency_metrics.get(benchmark_suite):
+            plt.axhline(self.slo, color="red", linestyle="--", label="SLO")
+
+        plt.xlabel(self.throughput_metrics[benchmark_suite])
+        plt.ylabel(metric)
+        plt.title(benchmark_name + "'s " + metric + " over a " + self.parameter + " sweep for the " + \
+                  self.name + " experiment")
+        plt.ylim(ymin = general_configs["graph-settings"]["y-min"])
+        plt.legend()
+        graph_name = "-".join([self.name, benchmark_suite, benchmark_name, metric]).replace("/", "-") + ".png"
+        graph_path = "/".join([general_configs["paths"]["analysis-directory"], \
+                                self.name, benchmark_suite, graph_name])
+        plt.savefig(graph_path)
+        plt.close()
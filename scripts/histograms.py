@@ -0,0 +1,175 @@
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+Latency histograms
+===================================================
+Filename: histograms.py
+Author: Reese Kuper
+Purpose: Read the HDR histograms exported by load
+generators (YCSB, memtier) so samples can be merged
+and percentiles taken from the merged counts
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+
+import re
+import zlib
+import base64
+import struct
+
+
+
+"""
+HDR histogram: Sparse counts keyed by the highest value equivalent to each recorded bucket (what
+HdrHistogram itself reports percentiles as), along with the size of buckets wider than one value.
+Histograms of the same metric merge by adding counts
+"""
+class hdr_histogram:
+    def __init__(self, histogram=None):
+        self.counts = {}
+        self.sizes = {}
+        if histogram is None: return
+        for value in histogram["counts"]:
+            self.record(int(value), histogram["counts"][value], histogram["sizes"].get(value, 1))
+
+
+    def record(self, value, count=1, size=1):
+        if count > 0:
+            self.counts[value] = self.counts.get(value, 0) + count
+            if size > 1:
+                self.sizes[value] = max(self.sizes.get(value, 1), size)
+
+
+    def add(self, other):
+        for value in other.counts:
+            self.record(value, other.counts[value], other.sizes.get(value, 1))
+        return self
+
+
+    def total(self):
+        return sum(self.counts.values())
+
+
+    # Same rounding as HdrHistogram's getValueAtPercentile()
+    def value_at_percentile(self, percentile):
+        values = sorted(self.counts)
+        if len(values) == 0: return 0
+        count_at_percentile = max(int(min(percentile, 100.0) / 100.0 * self.total() + 0.5), 1)
+        running_count = 0
+        for value in values:
+            running_count += self.counts[value]
+            if running_count >= count_at_percentile:
+                return value
+        return values[-1]
+
+
+    # Same as HdrHistogram's getMean(), from the middle (median equivalent value) of each bucket
+    def mean(self):
+        if self.total() == 0: return 0.0
+        return sum([(value - self.sizes.get(value, 1) + 1 + self.sizes.get(value, 1) // 2) * self.counts[value] \
+                    for value in self.counts]) / self.total()
+
+
+    def min(self):
+        return min(self.counts) if len(self.counts) > 0 else 0
+
+
+    def max(self):
+        return max(self.counts) if len(self.counts) > 0 else 0
+
+
+    # JSON friendly form (kept in each sample's processed data)
+    def to_dict(self):
+        return {"counts": {str(value): self.counts[value] for value in sorted(self.counts)}, \
+                "sizes": {str(value): self.sizes[value] for value in sorted(self.sizes)}}
+
+
+
+"""
+HdrHistogram V2 decoding: Each interval of a histogram log is a base64 encoded, zlib compressed
+histogram whose counts are zig-zag LEB128 encoded (negative values are runs of empty buckets).
+Cookies carry the word size in bits 4-7, which the V2 encoding does not depend on
+"""
+encoding_cookie = 0x1c849303
+compressed_encoding_cookie = 0x1c849304
+
+def read_zig_zag(payload, position):
+    value = shift = 0
+    for byte_index in range(9):
+        byte = payload[position]; position += 1
+        if byte_index == 8:
+            value |= byte << 56
+            break
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte & 0x80 == 0:
+            break
+    return (value >> 1) ^ -(value & 1), position
+
+
+def decode_histogram(encoded_histogram):
+    compressed = base64.b64decode(encoded_histogram)
+    cookie, compressed_length = struct.unpack(">ii", compressed[:8])
+    if cookie & ~0xf0 != compressed_encoding_cookie:
+        raise ValueError("Unsupported compressed histogram cookie " + hex(cookie))
+    encoded = zlib.decompress(compressed[8:8 + compressed_length])
+    cookie, payload_length, normalizing_offset, significant_digits, lowest_value, highest_value, _ = \
+            struct.unpack(">iiiiqqd", encoded[:40])
+    if cookie & ~0xf0 != encoding_cookie:
+        raise ValueError("Unsupported histogram encoding cookie " + hex(cookie))
+    if normalizing_offset != 0:
+        raise ValueError("Shifted (normalized) histograms are not supported")
+
+    # Bucket layout, as laid out by HdrHistogram for these parameters
+    unit_magnitude = max(int(lowest_value).bit_length() - 1, 0)
+    single_unit_resolution = 2 * 10 ** significant_digits
+    sub_bucket_count_magnitude = (single_unit_resolution - 1).bit_length()
+    sub_bucket_half_count_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+    sub_bucket_half_count = 1 << sub_bucket_half_count_magnitude
+
+    histogram = hdr_histogram()
+    payload = encoded[40:40 + payload_length]
+    position = index = 0
+    while position < len(payload):
+        count, position = read_zig_zag(payload, position)
+        if count < 0:
+            index -= count
+            continue
+        if count > 0:
+            bucket_index = (index >> sub_bucket_half_count_magnitude) - 1
+            sub_bucket_index = (index & (sub_bucket_half_count - 1)) + sub_bucket_half_count
+            if bucket_index < 0:
+                sub_bucket_index -= sub_bucket_half_count
+                bucket_index = 0
+            lowest_equivalent_value = sub_bucket_index << (bucket_index + unit_magnitude)
+            bucket_size = 1 << (bucket_index + unit_magnitude)
+            histogram.record(lowest_equivalent_value + bucket_size - 1, count, bucket_size)
+        index += 1
+    return histogram
+
+
+
+"""
+Histogram readers: A histogram log (.hdr/.txt, one histogram per interval) is the sum of its
+intervals. A percentile distribution (.hgrm) only keeps the printed points, so it is approximate
+"""
+def read_histogram_log(path):
+    histogram = hdr_histogram()
+    with open(path, "r") as log_file:
+        for line in log_file:
+            line = line.strip()
+            if line == "" or line.startswith("#") or line.startswith('"'): continue
+            fields = line.split(",")
+            if fields[0].startswith("Tag="): fields = fields[1:]
+            if len(fields) < 4: continue
+            histogram.add(decode_histogram(fields[3]))
+    return histogram
+
+
+def read_percentile_distribution(path, value_scale=1.0):
+    histogram = hdr_histogram()
+    previous_total_count = 0
+    with open(path, "r") as distribution_file:
+        for line in distribution_file:
+            fields = line.split()
+            if len(fields) < 3 or re.fullmatch(r"[0-9.]+", fields[0]) is None: continue
+            total_count = int(fields[2])
+            histogram.record(int(round(float(fields[0]) * value_scale)), total_count - previous_total_count)
+            previous_total_count = max(total_count, previous_total_count)
+    return histogram
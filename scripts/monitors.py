@@ -0,0 +1,490 @@
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+Readers and samplers for performance monitors
+===================================================
+Filename: monitors.py
+Author: Reese Kuper
+Purpose: Load the data produced by monitors (pcm,
+pcm-memory, ...) into arrays for processing and
+sample system counters while benchmarks run
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+
+import os
+import re
+import sys
+import time
+import array
+import warnings
+import threading
+import subprocess
+from backends import np, print_warning
+from topology import *
+
+
+
+"""
+PCM CSV reader: Parses the two header rows once into a column index and loads every
+interval row into a 2-D array (rows = intervals, columns = metrics)
+"""
+class pcm_csv:
+    summary_stats = ["mean", "p50", "p99", "max"]
+    def __init__(self, path):
+        self.path = path
+        self.categories = []
+        self.sub_categories = []
+        self.data = np.empty((0, 0))
+        self.column_paths = []
+
+
+    def load(self):
+        with open(self.path, mode='r') as file:
+            self.categories = [category.strip() for category in file.readline().rstrip("\n").split(",")]
+            self.sub_categories = [sub_category.strip() for sub_category in file.readline().rstrip("\n").split(",")]
+            first_row = file.readline().rstrip("\n").split(",")
+
+        # Only load columns that hold numbers (skips Date, Time, and trailing empty columns)
+        numeric_columns = []
+        for column in range(min(len(self.categories), len(self.sub_categories), len(first_row))):
+            try:
+                float(first_row[column].strip())
+                numeric_columns.append(column)
+            except ValueError:
+                continue
+        self.categories = [self.categories[column] for column in numeric_columns]
+        self.sub_categories = [self.sub_categories[column] for column in numeric_columns]
+        if len(numeric_columns) == 0:
+            self.data = np.empty((0, 0))
+            return self
+
+        try:
+            self.data = np.loadtxt(self.path, delimiter=",", skiprows=2, usecols=numeric_columns, ndmin=2)
+        except ValueError:
+            # Some intervals may hold non-numeric values (N/A, truncated final row, ...)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                self.data = np.genfromtxt(self.path, delimiter=",", skip_header=2, usecols=numeric_columns, \
+                        invalid_raise=False, dtype=float)
+            self.data = self.data.reshape(-1, len(numeric_columns))
+
+        self.column_paths = [self.index_column(category, sub_category) for category, sub_category \
+                                in zip(self.categories, self.sub_categories)]
+        return self
+
+
+    # Map a (category, sub-category) header pair to where its values go in the results
+    def index_column(self, category, sub_category):
+        paths = []
+        if "System" in category:
+            if category == "System":
+                paths.append(["System", sub_category])
+            else:
+                paths.append(["System", category[len("System "):], sub_category])
+
+        elif "Socket" in category:
+            if category.replace("Socket ", "").isdigit():
+                paths.append(["System", "Sockets", category, sub_category])
+            elif len(category.split(" (Socket ")) > 1 and category.split(" (Socket ")[-1][:-1].isdigit():
+                category_socket = category.split(" (Socket ")[-1][:-1]
+                category_nonsocket = category.split(" (Socket ")[0]
+                paths.append(["System", "Sockets", "Socket " + category_socket, "Cores", \
+                                category_nonsocket, sub_category])
+
+        elif "SKT" in category:
+            cat_split_nums = re.sub(r'(\d+(\.\d+)?)', r' \1 ', category).strip().split(" ")
+            socket = "Socket " + cat_split_nums[1]
+            if len(cat_split_nums) > 2:
+                paths.append(["System", "Sockets", socket, " ".join(cat_split_nums[2:]), sub_category])
+            else:
+                sub_cat_split_nums = re.sub(r'(\d+(\.\d+)?)', r' \1 ', sub_category).split(" ")
+                sub_cat_area = "Channels" if sub_cat_split_nums[0] == "Ch" else \
+                                    ("iMCs" if sub_cat_split_nums[0] == "iMC" else "Ignore")
+                if sub_cat_area != "Ignore" and len(sub_cat_split_nums) > 1 and sub_cat_split_nums[1].isdigit():
+                    sub_cat_num = ("Channel " if sub_cat_area == "Channels" else "iMC ") + sub_cat_split_nums[1]
+                    paths.append(["System", "Sockets", socket, sub_cat_area, sub_cat_num, \
+                                    " ".join(sub_cat_split_nums[2:]).strip()])
+                else:
+                    paths.append(["System", "Sockets", socket, sub_category])
+
+        if "SKT" in sub_category and sub_category.replace("SKT", "").isdigit():
+            paths.append(["System", "Sockets", "Socket " + sub_category.replace("SKT", ""), category])
+        return paths
+
+
+    # Summary statistics of every column over all intervals, computed at once per statistic
+    def summarize(self):
+        summaries = {}
+        if self.data.size == 0:
+            return summaries
+        valid = ~np.all(np.isnan(self.data), axis=0)
+        summaries["mean"] = np.full(self.data.shape[1], np.nan)
+        summaries["p50"] = np.full(self.data.shape[1], np.nan)
+        summaries["p99"] = np.full(self.data.shape[1], np.nan)
+        summaries["max"] = np.full(self.data.shape[1], np.nan)
+        summaries["mean"][valid] = np.nanmean(self.data[:, valid], axis=0)
+        summaries["p50"][valid], summaries["p99"][valid] = \
+                np.nanpercentile(self.data[:, valid], [50, 99], axis=0)
+        summaries["max"][valid] = np.nanmax(self.data[:, valid], axis=0)
+        return summaries
+
+
+    # Place the summary statistics of every column into the (nested) results dictionary
+    def fill(self, data):
+        summaries = self.summarize()
+        if len(summaries) == 0:
+            return data
+        for column, paths in enumerate(self.column_paths):
+            if np.isnan(summaries["mean"][column]):
+                continue
+            for path in paths:
+                nested = data
+                for key in path[:-1]:
+                    nested = nested.setdefault(key, {})
+                nested[path[-1]] = {stat: float(summaries[stat][column]) for stat in pcm_csv.summary_stats}
+        return data
+
+
+    # Keep the per-interval time series alongside the processed results
+    def save_series(self, path):
+        np.savez_compressed(path, data=self.data, categories=np.array(self.categories), \
+                sub_categories=np.array(self.sub_categories))
+
+
+
+"""
+vmstat sampler: Reads /proc/vmstat and every node's numastat at a fixed interval while a
+benchmark runs. Counters are kept as a compact array-backed time series (row-major)
+"""
+class vmstat_sampler(threading.Thread):
+    vmstat_prefixes = ["numa_", "pgmigrate_", "pgpromote_", "pgdemote_"]
+    node_directory = "/sys/devices/system/node"
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.columns = []
+        self.timestamps = array.array('d')
+        self.values = array.array('q')
+        self.node_files = []
+        if os.path.isdir(vmstat_sampler.node_directory):
+            for node in host_info().nodes():
+                self.node_files.append(("node" + str(node), os.path.join(vmstat_sampler.node_directory, \
+                                        "node" + str(node), "numastat")))
+
+
+    def read_counters(self):
+        counters = []
+        with open("/proc/vmstat", "r") as vmstat:
+            for line in vmstat:
+                fields = line.split()
+                if len(fields) == 2 and any(fields[0].startswith(prefix) for prefix in vmstat_sampler.vmstat_prefixes):
+                    counters.append((fields[0], int(fields[1])))
+        for node, numastat_file in self.node_files:
+            with open(numastat_file, "r") as numastat:
+                for line in numastat:
+                    fields = line.split()
+                    if len(fields) == 2:
+                        counters.append((node + "_" + fields[0], int(fields[1])))
+        return counters
+
+
+    # The columns are fixed by the first sample so every row lines up
+    def sample(self):
+        counters = dict(self.read_counters())
+        if len(self.columns) == 0:
+            self.columns = list(counters)
+        self.timestamps.append(time.monotonic())
+        self.values.extend([counters.get(column, 0) for column in self.columns])
+
+
+    def run(self):
+        while True:
+            self.sample()
+            if self.stop_event.wait(self.interval):
+                break
+
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+        self.sample()
+
+
+    def save(self, path):
+        np.savez_compressed(path, timestamps=np.frombuffer(self.timestamps, dtype=np.float64), \
+                columns=np.array(self.columns), \
+                values=np.frombuffer(self.values, dtype=np.int64).reshape(-1, max(len(self.columns), 1)))
+
+
+
+"""
+vmstat series: Rates and phase breakdowns of the counters saved by the vmstat sampler
+"""
+class vmstat_series:
+    def __init__(self, path):
+        series = np.load(path)
+        self.timestamps = series["timestamps"]
+        self.columns = [str(column) for column in series["columns"]]
+        self.values = series["values"]
+
+
+    # Per counter: total change, average and peak rate (per second), and change in each phase
+    def summarize(self, phases=3):
+        summaries = {}
+        if len(self.timestamps) < 2 or len(self.columns) == 0:
+            return summaries
+        duration = self.timestamps[-1] - self.timestamps[0]
+        deltas = np.diff(self.values, axis=0)
+        intervals = np.diff(self.timestamps)
+        rates = deltas / np.maximum(intervals, 1e-9)[:, None]
+        totals = self.values[-1] - self.values[0]
+
+        # Phases split the run into equal lengths of time
+        boundaries = np.searchsorted(self.timestamps, \
+                self.timestamps[0] + duration * np.arange(1, phases) / phases)
+        phase_indices = np.concatenate(([0], boundaries, [len(self.timestamps) - 1]))
+        for column_index, column in enumerate(self.columns):
+            summary = {}
+            summary["total"] = int(totals[column_index])
+            summary["rate"] = float(totals[column_index] / duration) if duration > 0 else 0.0
+            summary["max-rate"] = float(np.max(rates[:, column_index]))
+            for phase in range(phases):
+                summary["phase-" + str(phase + 1)] = int(self.values[phase_indices[phase + 1], column_index] - \
+                                                        self.values[phase_indices[phase], column_index])
+            summaries[column.replace('_', '-')] = summary
+        return summaries
+
+
+
+"""
+Privileged reader: Benchmarks run through sudo (numactl, pcm, ...), so their smaps_rollup and
+numa_maps are root's. When the harness is not root, one 'sudo -n' python process stays alive for
+the run and reads the files it is sent (path per line in, length prefixed contents out, -1 when
+unreadable), so no process is forked per file
+"""
+class privileged_reader:
+    code = "import sys\n" + \
+           "for path in sys.stdin:\n" + \
+           "    try:\n" + \
+           "        contents = open(path.strip(), 'rb').read()\n" + \
+           "    except OSError:\n" + \
+           "        sys.stdout.buffer.write(b'-1\\n'); sys.stdout.buffer.flush(); continue\n" + \
+           "    sys.stdout.buffer.write(str(len(contents)).encode() + b'\\n' + contents); sys.stdout.buffer.flush()\n"
+    def __init__(self):
+        self.process = subprocess.Popen(["sudo", "-n", sys.executable, "-c", privileged_reader.code], \
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+    # Returns a reader once it answers, None when sudo needs a password (or is missing)
+    @staticmethod
+    def open():
+        try:
+            reader = privileged_reader()
+            reader.read("/proc/self/stat")
+            return reader
+        except (OSError, ValueError):
+            return None
+
+
+    def read(self, path):
+        self.process.stdin.write((path + "\n").encode())
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if line == b"":
+            raise BrokenPipeError("The privileged reader exited")
+        length = int(line)
+        if length < 0:
+            raise FileNotFoundError(path)
+        return self.process.stdout.read(length).decode(errors="replace")
+
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+
+"""
+Process sampler: Follows the benchmark's process tree (the shell spawned by Popen and all of its
+children) through /proc at a fixed interval without forking any tools. Faults and CPU time include
+the totals of reaped children (a live child only counts in its own entry), so a child's work stays
+counted once it exits. Files only root may read (smaps_rollup, numa_maps of runs started through
+sudo) go through the privileged reader when the harness is not root. Without root or passwordless
+sudo, their columns can not be filled, which is reported once
+"""
+class process_sampler(threading.Thread):
+    columns = ["processes", "rss-kb", "pss-kb", "swap-kb", "minor-faults", "major-faults", "cpu-time-(s)"]
+    page_kb = os.sysconf("SC_PAGE_SIZE") // 1024
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    def __init__(self, root_pid, interval, numa_maps_every=5):
+        super().__init__(daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.numa_maps_every = max(numa_maps_every, 1)
+        self.stop_event = threading.Event()
+        self.nodes = []
+        if os.path.isdir(vmstat_sampler.node_directory):
+            self.nodes = host_info().nodes()
+        self.node_columns = ["node" + str(node) + "-pages" for node in self.nodes]
+        self.timestamps = array.array('d')
+        self.values = array.array('d')
+        self.samples = 0
+        self.reader = None
+        self.unreadable_files = set()
+
+
+    def warn_unreadable(self, file_name, pid):
+        if file_name not in self.unreadable_files:
+            self.unreadable_files.add(file_name)
+            print_warning("Can not read /proc/" + str(pid) + "/" + file_name + " (permission denied), " + \
+                            "its columns stay empty unless the harness runs as root or with passwordless sudo")
+
+
+    # Contents of a /proc file of the process, read with privileges when the harness is denied
+    def read_proc_file(self, pid, file_name):
+        path = "/proc/" + str(pid) + "/" + file_name
+        try:
+            with open(path, "r") as proc_file:
+                return proc_file.read()
+        except PermissionError:
+            if self.reader is None:
+                self.warn_unreadable(file_name, pid)
+                raise
+            return self.reader.read(path)
+
+
+    # Children are listed per thread when the kernel has CONFIG_PROC_CHILDREN, otherwise scan /proc
+    def process_tree(self):
+        tree = [self.root_pid]
+        if os.path.exists("/proc/" + str(self.root_pid) + "/task/" + str(self.root_pid) + "/children"):
+            index = 0
+            while index < len(tree):
+                try:
+                    for task in os.listdir("/proc/" + str(tree[index]) + "/task"):
+                        with open("/proc/" + str(tree[index]) + "/task/" + task + "/children", "r") as children:
+                            tree += [int(child) for child in children.read().split()]
+                except OSError:
+                    pass
+                index += 1
+            return tree
+
+        parents = {}
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit(): continue
+            try:
+                with open("/proc/" + pid + "/stat", "r") as stat:
+                    parents.setdefault(int(stat.read().rsplit(")", 1)[1].split()[1]), []).append(int(pid))
+            except (OSError, IndexError):
+                continue
+        index = 0
+        while index < len(tree):
+            tree += parents.get(tree[index], [])
+            index += 1
+        return tree
+
+
+    def read_process(self, pid, read_numa_maps):
+        values = dict.fromkeys(process_sampler.columns, 0.0)
+        node_pages = [0.0] * len(self.nodes)
+        with open("/proc/" + str(pid) + "/stat", "r") as stat:
+            fields = stat.read().rsplit(")", 1)[1].split()
+        values["processes"] = 1
+        values["minor-faults"] = int(fields[7]) + int(fields[8])
+        values["major-faults"] = int(fields[9]) + int(fields[10])
+        values["cpu-time-(s)"] = (int(fields[11]) + int(fields[12]) + int(fields[13]) + int(fields[14])) / \
+                                    process_sampler.clock_ticks
+        values["rss-kb"] = int(fields[21]) * process_sampler.page_kb
+        try:
+            for line in self.read_proc_file(pid, "smaps_rollup").split("\n"):
+                if line.startswith("Pss:"):
+                    values["pss-kb"] = int(line.split()[1])
+                elif line.startswith("Swap:"):
+                    values["swap-kb"] = int(line.split()[1])
+        except OSError:
+            pass
+        if read_numa_maps:
+            try:
+                for line in self.read_proc_file(pid, "numa_maps").split("\n"):
+                    for field in line.split():
+                        if field.startswith("N") and "=" in field and field[1:field.index("=")].isdigit():
+                            node = int(field[1:field.index("=")])
+                            if node in self.nodes:
+                                node_pages[self.nodes.index(node)] += int(field[field.index("=") + 1:])
+            except OSError:
+                node_pages = [float("nan")] * len(self.nodes)
+        else:
+            node_pages = [float("nan")] * len(self.nodes)
+        return values, node_pages
+
+
+    # numa_maps walks the page tables, so it is only read every numa_maps_every samples
+    def sample(self):
+        read_numa_maps = (self.samples % self.numa_maps_every) == 0
+        totals = dict.fromkeys(process_sampler.columns, 0.0)
+        node_totals = [0.0 if read_numa_maps else float("nan")] * len(self.nodes)
+        for pid in self.process_tree():
+            try:
+                values, node_pages = self.read_process(pid, read_numa_maps)
+            except (OSError, IndexError, ValueError):
+                continue
+            for column in process_sampler.columns:
+                totals[column] += values[column]
+            node_totals = [node_total + node_page for node_total, node_page in zip(node_totals, node_pages)]
+        self.timestamps.append(time.monotonic())
+        self.values.extend([totals[column] for column in process_sampler.columns] + node_totals)
+        self.samples += 1
+
+
+    def run(self):
+        if os.geteuid() != 0:
+            self.reader = privileged_reader.open()
+        try:
+            while True:
+                self.sample()
+                if self.stop_event.wait(self.interval):
+                    break
+        finally:
+            if self.reader is not None:
+                self.reader.close()
+
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+
+    def save(self, path):
+        columns = process_sampler.columns + self.node_columns
+        np.savez_compressed(path, timestamps=np.frombuffer(self.timestamps, dtype=np.float64), \
+                columns=np.array(columns), \
+                values=np.frombuffer(self.values, dtype=np.float64).reshape(-1, len(columns)))
+
+
+
+"""
+Process series: Summaries of the process tree samples saved by the process sampler
+"""
+class process_series:
+    peak_columns = ["processes", "minor-faults", "major-faults", "cpu-time-(s)"]
+    def __init__(self, path):
+        series = np.load(path)
+        self.timestamps = series["timestamps"]
+        self.columns = [str(column) for column in series["columns"]]
+        self.values = series["values"]
+
+
+    # Counters (faults, CPU time) report their peak, sizes (RSS, PSS, node pages) their mean and max
+    def summarize(self):
+        summaries = {}
+        if len(self.timestamps) == 0:
+            return summaries
+        for column_index, column in enumerate(self.columns):
+            column_values = self.values[:, column_index]
+            if np.all(np.isnan(column_values)):
+                continue
+            if column in process_series.peak_columns:
+                summaries[column] = float(np.nanmax(column_values))
+            else:
+                summaries[column] = {"mean": float(np.nanmean(column_values)), "max": float(np.nanmax(column_values))}
+        return summaries
@@ -0,0 +1,319 @@
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+Schedule benchmark runs onto the host
+===================================================
+Filename: scheduler.py
+Author: Reese Kuper
+Purpose: Run each experiment's jobs either one after
+another or co-run independent jobs on disjoint CPU
+sets of their NUMA nodes
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+
+import os
+import re
+import copy
+import subprocess
+import threading
+from colorama import Fore, Back, Style
+from backends import *
+from cgroups import *
+from topology import *
+
+
+
+"""
+CPU lists in the form numactl and sysfs take, e.g. 0-3,8-11
+"""
+def format_cpu_list(cpus):
+    cpu_ranges = []
+    for cpu in sorted(cpus):
+        if len(cpu_ranges) > 0 and cpu_ranges[-1][1] == cpu - 1:
+            cpu_ranges[-1][1] = cpu
+        else:
+            cpu_ranges.append([cpu, cpu])
+    return ",".join([str(first_cpu) if first_cpu == last_cpu else str(first_cpu) + "-" + str(last_cpu) \
+                        for first_cpu, last_cpu in cpu_ranges])
+
+
+
+"""
+Memory policy: Where a run's threads and memory go. Expands into numactl arguments, with the
+interleave weights (system wide, in sysfs) applied around the run for weighted interleaving, and
+an optional capacity that runs it in its own cgroup limited to that much memory
+"""
+class mem_policy:
+    policies = {"bind": "--membind=", "interleave": "--interleave=", "preferred": "--preferred=", \
+                "preferred-many": "--preferred-many=", "weighted-interleave": "--weighted-interleave="}
+    weights_directory = "/sys/kernel/mm/mempolicy/weighted_interleave"
+    def __init__(self, name, cpu_nodes, mem_nodes, policy="bind", weights={}, capacity=None):
+        self.name = name
+        self.cpu_nodes = [int(cpu_node) for cpu_node in cpu_nodes]
+        self.mem_nodes = [int(mem_node) for mem_node in mem_nodes]
+        self.policy = policy
+        self.weights = {int(mem_node): int(weights[mem_node]) for mem_node in weights}
+        self.capacity = capacity
+
+
+    @staticmethod
+    def from_spec(name, spec):
+        return mem_policy(name, spec.get("cpu-nodes", []), spec.get("mem-nodes", []), \
+                          spec.get("policy", "bind"), spec.get("weights") or {}, spec.get("capacity"))
+
+
+    # Preferred policies may fall back to any node, so only the others confine the cgroup's nodes
+    def capacity_cgroup(self, name):
+        cgroup_mem_nodes = [] if self.policy.startswith("preferred") else self.mem_nodes
+        return capacity_cgroup(name, cgroup_mem_nodes, self.capacity)
+
+
+    def mem_args(self):
+        return mem_policy.policies[self.policy] + ",".join([str(mem_node) for mem_node in self.mem_nodes])
+
+
+    # Checks the policy against the host's topology, returning the number of errors found
+    def validate(self):
+        errors = 0
+        if self.policy not in mem_policy.policies:
+            print_error(self.name + ": unknown memory policy " + str(self.policy) + " (use one of " + \
+                        ", ".join(mem_policy.policies) + ")"); return 1
+        if len(self.cpu_nodes) == 0 or len(self.mem_nodes) == 0:
+            print_error(self.name + ": needs both cpu-nodes and mem-nodes"); errors += 1
+        host = host_info()
+        for cpu_node in [cpu_node for cpu_node in self.cpu_nodes if cpu_node not in host.nodes_with("cpu")]:
+            print_error(self.name + ": NUMA node " + str(cpu_node) + " has no CPUs"); errors += 1
+        for mem_node in [mem_node for mem_node in self.mem_nodes if mem_node not in host.nodes_with("memory")]:
+            print_error(self.name + ": NUMA node " + str(mem_node) + " has no memory"); errors += 1
+        if self.policy == "preferred" and len(self.mem_nodes) != 1:
+            print_error(self.name + ": the preferred policy takes a single node (see preferred-many)"); errors += 1
+        if self.policy == "weighted-interleave":
+            if not os.path.isdir(mem_policy.weights_directory):
+                print_error(self.name + ": this kernel has no weighted interleaving (" + \
+                            mem_policy.weights_directory + ")"); errors += 1
+            for mem_node in self.weights:
+                if mem_node not in self.mem_nodes or not 1 <= self.weights[mem_node] <= 255:
+                    print_error(self.name + ": weights must be 1-255 for nodes in mem-nodes"); errors += 1
+        elif len(self.weights) > 0:
+            print_warning(self.name + ": weights only apply to the weighted-interleave policy")
+        if self.capacity is not None:
+            if parse_capacity(self.capacity) is None:
+                print_error(self.name + ": capacity " + str(self.capacity) + " is not a size (e.g. 512M, 8G, max)")
+                errors += 1
+            errors += capacity_cgroup.check_host(self.name)
+        return errors
+
+
+    # Returns the weights they replaced so they can be restored after the run
+    def apply_weights(self, weights):
+        previous_weights = {}
+        for mem_node in weights:
+            weight_file = os.path.join(mem_policy.weights_directory, "node" + str(mem_node))
+            try:
+                with open(weight_file, "r") as weight_fp:
+                    previous_weights[mem_node] = int(weight_fp.read().strip())
+            except (OSError, ValueError):
+                pass
+            if subprocess.run("echo " + str(weights[mem_node]) + " | sudo tee " + weight_file, shell=True, \
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode != 0:
+                print_warning("Could not set the interleave weight of node " + str(mem_node))
+        return previous_weights
+
+
+
+"""
+Execution job: One benchmark run under one configuration. Each job has its own copy of the
+benchmark and of the command prefixes, so jobs never share mutable state
+"""
+class execution_job:
+    default_duration = 60   # Seconds per sample assumed for benchmarks with no history or timing parameters
+    def __init__(self, benchmark, exe_prefixes, active_glob, cpu_nodes=None, mem_args="", name="", policy=None):
+        self.benchmark = copy.copy(benchmark)
+        self.exe_prefixes = exe_prefixes.copy()
+        self.active_glob = active_glob
+        self.cpu_nodes = cpu_nodes if cpu_nodes is not None else []
+        self.mem_args = mem_args
+        self.name = name if name != "" else benchmark.name
+        self.policy = policy
+        self.cgroup = None
+        self.journal = None
+        self.history = None
+        self.cpus = []
+
+
+    # Runs with a capacity join their cgroup first, so redis-servers started with this prefix are limited too
+    def numa_prefix(self):
+        if len(self.cpus) > 0:
+            cpu_args = "--physcpubind=" + format_cpu_list(self.cpus)
+        else:
+            cpu_args = "--cpunodebind=" + ",".join([str(cpu_node) for cpu_node in self.cpu_nodes])
+        cgroup_prefix = self.cgroup.prefix() if self.cgroup is not None else ""
+        return " ".join([cgroup_prefix, "sudo numactl", cpu_args, self.mem_args]).strip()
+
+
+    # What the host is set up as for the job: its NUMA binding, interleave weights and capacity
+    def configuration(self):
+        if self.policy is None:
+            return (tuple(self.cpu_nodes), self.mem_args, (), "")
+        return (tuple(self.cpu_nodes), self.mem_args, tuple(sorted(self.policy.weights.items())), \
+                str(self.policy.capacity))
+
+
+    # Returns the job's estimated seconds per sample and what the estimate is based on
+    # NOTE: Override for jobs that do more than run the benchmark once per sample
+    def estimate(self, history):
+        duration = history.estimate(self.benchmark.command_fingerprint())
+        if duration is not None:
+            return duration, "history"
+        duration = self.benchmark.estimate_duration()
+        if duration is not None:
+            return duration, "parameters"
+        return execution_job.default_duration, "default"
+
+
+    # Number of times the benchmark runs its samples (more than once when stepping through a sweep)
+    def steps(self):
+        return 1
+
+
+    # NOTE: Override for jobs that do more than run the benchmark once per sample
+    def run(self, general_configs):
+        self.cgroup = None
+        if "numa" in self.exe_prefixes and self.policy is not None and self.policy.capacity is not None:
+            self.cgroup = self.policy.capacity_cgroup(os.path.basename(self.active_glob))
+            if self.cgroup.create() > 0:
+                print_warning(self.name + " runs without its " + str(self.policy.capacity) + " capacity limit")
+                self.cgroup.remove()
+                self.cgroup = None
+        if "numa" in self.exe_prefixes and len(self.cpu_nodes) > 0:
+            self.exe_prefixes["numa"] = self.numa_prefix()
+        self.benchmark.exe_prefixes = self.exe_prefixes
+        self.benchmark.active_glob = self.active_glob
+        self.benchmark.journal = self.journal
+        self.benchmark.history = self.history
+        previous_weights = {}
+        if self.policy is not None and len(self.policy.weights) > 0:
+            previous_weights = self.policy.apply_weights(self.policy.weights)
+        try:
+            self.benchmark.execute_wrapper(general_configs)
+        finally:
+            if len(previous_weights) > 0:
+                self.policy.apply_weights(previous_weights)
+            if self.cgroup is not None:
+                if self.cgroup.oom_kills() > 0:
+                    print_warning(self.name + " hit its " + str(self.policy.capacity) + " capacity limit, " + \
+                                    str(self.cgroup.oom_kills()) + " process(es) were OOM killed")
+                self.cgroup.remove()
+
+
+
+"""
+Scheduler: 'serial' runs jobs in order. 'concurrent' co-runs jobs that are safe to share the
+host on disjoint CPUs of their NUMA nodes, falling back to running alone for jobs that are not
+(e.g. suites sharing a Redis server) or that are not bound to any node. Co-run jobs skip the
+system wide counters (pcm, vmstat) and are flagged as shared-host in their results. A job that
+raises is reported as failed at the end instead of stopping the campaign
+"""
+class scheduler:
+    policies = ["serial", "concurrent"]
+    def __init__(self, general_configs):
+        self.policy = general_configs["script-settings"]["schedule-policy"]
+        self.host_cpus = {}
+        self.free_cpus = {}
+        self.busy_directories = set()
+        self.failed_jobs = []
+        self.condition = threading.Condition()
+
+
+    def run(self, general_configs, jobs):
+        if self.policy not in scheduler.policies:
+            print_error("Unknown schedule policy, " + str(self.policy) + ", running jobs serially")
+            self.policy = "serial"
+        if self.policy == "serial":
+            for job in jobs:
+                self.run_job(general_configs, job)
+            return self.report_failures()
+
+        # System wide monitors (pcm) hold the PMU counters and can not be shared between co-running jobs
+        pcm_prefixes = [exe_prefix for exe_prefix in general_configs["exe-prefixes"] if "pcm" in exe_prefix]
+        if len(pcm_prefixes) > 0:
+            print_warning("Concurrent scheduling disables system-wide monitors: " + ", ".join(pcm_prefixes))
+
+        self.host_cpus = host_info().node_cpus()
+        self.free_cpus = {cpu_node: list(self.host_cpus[cpu_node]) for cpu_node in self.host_cpus}
+        running_jobs = []
+        for job in jobs:
+            # Interleave weights are system wide, jobs setting them run alone
+            if not job.benchmark.concurrent_safe or self.node_cpu_count(job) == 0 or \
+                    (job.policy is not None and len(job.policy.weights) > 0):
+                self.wait_for_jobs(running_jobs)
+                running_jobs = []
+                self.run_job(general_configs, job)
+                continue
+
+            for exe_prefix in pcm_prefixes:
+                job.exe_prefixes.pop(exe_prefix, None)
+            job.benchmark.shared_host = True
+            job.cpus = self.reserve_cpus(job)
+            print_step("SCHEDULE", Fore.BLUE, job.name + " on CPUs " + format_cpu_list(job.cpus) + \
+                        " of node(s) " + ",".join([str(cpu_node) for cpu_node in job.cpu_nodes]))
+            job_thread = threading.Thread(target=self.run_job, args=(general_configs, job))
+            job_thread.start()
+            running_jobs.append(job_thread)
+        self.wait_for_jobs(running_jobs)
+        return self.report_failures()
+
+
+    # Returns the number of failed jobs. Their unfinished samples are not journaled, --resume reruns them
+    def report_failures(self):
+        if len(self.failed_jobs) > 0:
+            print_error(str(len(self.failed_jobs)) + " job(s) failed, rerun them with --resume:")
+            for job_name, reason in self.failed_jobs:
+                print("    " + job_name + ": " + reason)
+        return len(self.failed_jobs)
+
+
+    def wait_for_jobs(self, running_jobs):
+        for job_thread in running_jobs:
+            job_thread.join()
+
+
+    def node_cpu_count(self, job):
+        return sum([len(self.host_cpus.get(cpu_node, [])) for cpu_node in job.cpu_nodes])
+
+
+    # Block until enough CPUs are free on the job's nodes (or all of them, for jobs bigger than the nodes)
+    # and, for suites writing fixed files into their directory, until no other job runs in it
+    def reserve_cpus(self, job):
+        cpu_demand = max(1, min(job.benchmark.cpu_demand(), self.node_cpu_count(job)))
+        directory = job.benchmark.info.get("path") if job.benchmark.exclusive_directory else None
+        with self.condition:
+            while sum([len(self.free_cpus.get(cpu_node, [])) for cpu_node in job.cpu_nodes]) < cpu_demand or \
+                    directory in self.busy_directories:
+                self.condition.wait()
+            if directory is not None:
+                self.busy_directories.add(directory)
+            reserved_cpus = []
+            for cpu_node in job.cpu_nodes:
+                while len(reserved_cpus) < cpu_demand and len(self.free_cpus.get(cpu_node, [])) > 0:
+                    reserved_cpus.append(self.free_cpus[cpu_node].pop(0))
+        return reserved_cpus
+
+
+    def run_job(self, general_configs, job):
+        try:
+            job.run(general_configs)
+        except Exception as exception:
+            print_error("Job " + job.name + " failed: " + str(exception))
+            with self.condition:
+                self.failed_jobs.append((job.name, type(exception).__name__ + ": " + str(exception)))
+        finally:
+            with self.condition:
+                if job.benchmark.exclusive_directory:
+                    self.busy_directories.discard(job.benchmark.info.get("path"))
+                for cpu in job.cpus:
+                    for cpu_node in job.cpu_nodes:
+                        if cpu in self.host_cpus.get(cpu_node, []):
+                            self.free_cpus[cpu_node].append(cpu)
+                            break
+                for cpu_node in job.cpu_nodes:
+                    if cpu_node in self.free_cpus:
+                        self.free_cpus[cpu_node].sort()
+                self.condition.notify_all()
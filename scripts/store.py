@@ -0,0 +1,91 @@
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+Columnar results store
+===================================================
+Filename: store.py
+Author: Reese Kuper
+Purpose: Keep processed results in one SQLite table
+keyed by experiment, suite, benchmark, config, mode,
+sample, and metric so analysis only loads what it uses
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+
+import os
+import sqlite3
+from backends import flatten_dict
+
+
+
+"""
+Results store: one row per (experiment, suite, benchmark, config, mode, sample, metric).
+Averaged results across samples are stored with the sample set to averaged_sample, along with
+the spread of the metric across the samples (the statistics columns are NULL for single samples)
+"""
+class results_store:
+    averaged_sample = -1
+    statistic_columns = ["stddev", "min", "max", "ci95", "count"]
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results (experiment TEXT, suite TEXT, " + \
+                "benchmark TEXT, config TEXT, mode TEXT, sample INTEGER, metric TEXT, value REAL, " + \
+                "stddev REAL, min REAL, max REAL, ci95 REAL, count INTEGER)")
+
+        # Stores written before the statistics columns existed
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(results)")]
+        for column in results_store.statistic_columns:
+            if column not in columns:
+                self.connection.execute("ALTER TABLE results ADD COLUMN " + column + \
+                        (" INTEGER" if column == "count" else " REAL"))
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_lookup ON results " + \
+                "(experiment, suite, sample, metric)")
+
+
+    def close(self):
+        self.connection.close()
+
+
+    def clear(self, experiment):
+        with self.connection:
+            self.connection.execute("DELETE FROM results WHERE experiment = ?", (experiment,))
+
+
+    # Flatten (nested) data into rows, skipping anything that is not a number. Statistics map the
+    # flattened metrics to their running_stats across samples
+    def write(self, experiment, suite, benchmark, config, mode, sample, data, statistics={}):
+        rows = []
+        for metric, value in flatten_dict(data):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            row = [experiment, suite, benchmark, config, mode, sample, metric, float(value)]
+            if metric in statistics:
+                row += [statistics[metric].stddev(), statistics[metric].min, statistics[metric].max, \
+                        statistics[metric].ci95(), statistics[metric].count]
+            else:
+                row += [None] * len(results_store.statistic_columns)
+            rows.append(tuple(row))
+        with self.connection:
+            self.connection.executemany("INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+    # Return results of a suite keyed the same way as flatten_dict() would key the nested results.
+    # Column picks the value or one of the statistics columns (missing statistics are left out).
+    # Metrics ('_' separated, as configured for analysis) limit it to the keys holding all of the
+    # segments of at least one of them (within a segment, as metric_index matches them)
+    def flattened(self, experiment, suite, sample=averaged_sample, metrics=None, column="value"):
+        if column != "value" and column not in results_store.statistic_columns:
+            raise ValueError("Unknown results column " + str(column))
+        query = "SELECT benchmark, config, mode, metric, " + column + " FROM results " + \
+                "WHERE experiment = ? AND suite = ? AND sample = ? AND " + column + " IS NOT NULL"
+        parameters = [experiment, suite, sample]
+        if metrics is not None:
+            metric_filters = []
+            for metric in metrics:
+                segments = [segment for segment in metric.split("_") if segment != ""]
+                metric_filters.append("(" + " AND ".join(["instr(benchmark || '_' || config || '_' || mode || " + \
+                                        "'_' || metric, ?) > 0"] * len(segments)) + ")")
+                parameters += segments
+            query += " AND (" + (" OR ".join(metric_filters) if len(metric_filters) > 0 else "0") + ")"
+        flattened_results = {}
+        for benchmark, config, mode, metric, value in self.connection.execute(query, parameters):
+            flattened_results["_".join([key for key in [benchmark, config, mode, metric] if key])] = value
+        return flattened_results
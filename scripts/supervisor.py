@@ -0,0 +1,126 @@
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+Supervise a running benchmark
+===================================================
+Filename: supervisor.py
+Author: Reese Kuper
+Purpose: React to a benchmark exiting as soon as it
+happens, drive the status updates from a timer, kill
+runs that time out, and manage monitor processes
+running alongside it
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+
+import os
+import time
+import select
+import subprocess
+from backends import *
+
+
+
+"""
+Supervisor: Waits on the benchmark (primary) process through a pidfd when the kernel has them,
+so its exit wakes the supervisor immediately, otherwise through Popen.wait's own timed waits.
+Every process is expected to run in its own session: a primary still running after the timeout
+has its whole process group torn down, as does anything it leaves behind when it exits, and
+monitor processes added alongside it are stopped once the benchmark exits
+"""
+class supervisor:
+    stop_grace_period = 5
+    def __init__(self, update_interval, on_update=None, timeout=None):
+        self.update_interval = max(update_interval, 1)
+        self.on_update = on_update
+        self.timeout = timeout
+        self.timed_out = False
+        self.primary = None
+        self.monitors = {}
+        self.start_time = self.end_time = 0.0
+        self.start_timestamp = 0.0
+
+
+    def add(self, name, process, primary=False):
+        if primary:
+            self.primary = process
+        else:
+            self.monitors[name] = process
+
+
+    def open_pidfd(self):
+        try:
+            return os.pidfd_open(self.primary.pid)
+        except (AttributeError, OSError):
+            return None
+
+
+    # Wait up to timeout seconds for the primary process to exit
+    def wait(self, pidfd, timeout):
+        if pidfd is not None:
+            select.select([pidfd], [], [], timeout)
+            self.primary.poll()
+        else:
+            try:
+                self.primary.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                pass
+
+
+    # Called right before the primary is started, so the run's time covers all of it
+    def mark_start(self):
+        self.start_time = time.monotonic()
+        self.start_timestamp = time.time()
+
+
+    # Returns the (monotonic) start and end times of the primary process
+    def run(self):
+        if self.start_time == 0.0:
+            self.mark_start()
+        pidfd = self.open_pidfd()
+        update = 0
+        next_update = self.start_time + self.update_interval
+        deadline = self.start_time + self.timeout if self.timeout is not None else None
+        exited_monitors = []
+        try:
+            while self.primary.poll() is None:
+                wake_time = next_update if deadline is None else min(next_update, deadline)
+                self.wait(pidfd, max(wake_time - time.monotonic(), 0))
+                if self.primary.returncode is None and deadline is not None and time.monotonic() >= deadline:
+                    print_warning("Run timed out after " + str(round(self.timeout)) + "s, stopping its processes")
+                    self.timed_out = True
+                    break
+                if self.primary.returncode is None and time.monotonic() >= next_update:
+                    update += 1
+                    next_update += self.update_interval
+                    if self.on_update is not None:
+                        self.on_update(update)
+
+                # Monitors should outlive the benchmark, let the user know if one did not
+                for name in self.monitors:
+                    if name not in exited_monitors and self.monitors[name].poll() is not None:
+                        print_warning("Monitor " + name + " exited early with code " + \
+                                        str(self.monitors[name].returncode))
+                        exited_monitors.append(name)
+        finally:
+            self.end_time = time.monotonic()
+            if pidfd is not None:
+                os.close(pidfd)
+            self.stop_primary()
+            self.stop_monitors()
+        return self.start_time, self.end_time
+
+
+    # Also reaps whatever the primary left running in its group (e.g. a networked server)
+    def stop_primary(self):
+        if self.primary is not None and group_alive(self.primary.pid):
+            if not stop_group(self.primary, supervisor.stop_grace_period):
+                print_error("Could not stop every process of the run (process group " + str(self.primary.pid) + ")")
+
+
+    def stop_monitors(self):
+        for name in self.monitors:
+            if group_alive(self.monitors[name].pid) and \
+                    not stop_group(self.monitors[name], supervisor.stop_grace_period):
+                print_error("Could not stop monitor " + name)
+
+
+    def stop(self):
+        self.stop_primary()
+        self.stop_monitors()
@@ -0,0 +1,201 @@
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+Host topology
+===================================================
+Filename: topology.py
+Author: Reese Kuper
+Purpose: Discover the host's sockets, NUMA nodes,
+CPUs, SMT siblings, node memory and distances once
+from sysfs and share them (cached per boot) with
+processing, config validation, and syscfg-adjust
+"""""""""""""""""""""""""""""""""""""""""""""""""""
+
+import os
+import re
+import json
+import tempfile
+
+
+
+"""
+CPU (and node) lists as sysfs writes them, e.g. 0-3,8-11
+"""
+def parse_cpu_list(cpu_list):
+    cpus = []
+    for cpu_range in cpu_list.strip().split(","):
+        if cpu_range == "": continue
+        if "-" in cpu_range:
+            first_cpu, last_cpu = cpu_range.split("-")
+            cpus += list(range(int(first_cpu), int(last_cpu) + 1))
+        else:
+            cpus.append(int(cpu_range))
+    return cpus
+
+
+def read_sysfs(path, default=""):
+    try:
+        with open(path, "r") as sysfs_file:
+            return sysfs_file.read().strip()
+    except OSError:
+        return default
+
+
+
+"""
+Host topology: Everything is read from sysfs in one pass and kept in a JSON cache keyed by the boot
+ID, the online CPUs and each node's memory, so each process (e.g. every processing worker) reads a
+few files instead of scanning sysfs. CPUs or memory onlined or offlined by anything (syscfg-adjust,
+hotplug) change the key and the topology is discovered again
+"""
+class host_topology:
+    cpu_directory = "/sys/devices/system/cpu"
+    node_directory = "/sys/devices/system/node"
+    memory_directory = "/sys/devices/system/memory"
+    cache_path = os.path.join(tempfile.gettempdir(), "numa-benchmarks-topology-" + str(os.getuid()) + ".json")
+    def __init__(self, info):
+        self.info = info
+
+
+    # Per-node MemTotal follows memory blocks going on or offline, without reading every block
+    @staticmethod
+    def cache_key():
+        key = [read_sysfs("/proc/sys/kernel/random/boot_id"), read_sysfs(os.path.join(host_topology.cpu_directory, \
+                "online"))]
+        if os.path.isdir(host_topology.node_directory):
+            for node in sorted(os.listdir(host_topology.node_directory)):
+                if re.fullmatch(r"node\d+", node):
+                    for line in read_sysfs(os.path.join(host_topology.node_directory, node, "meminfo")).split("\n"):
+                        if "MemTotal:" in line:
+                            key.append(node + " " + line.split()[-2])
+        return key
+
+
+    @staticmethod
+    def load(refresh=False):
+        if not refresh:
+            try:
+                with open(host_topology.cache_path, "r") as cache_file:
+                    info = json.load(cache_file)
+                if info.get("key") == host_topology.cache_key():
+                    return host_topology(info)
+            except (OSError, ValueError):
+                pass
+        topology = host_topology(host_topology.discover())
+        topology.save()
+        return topology
+
+
+    def save(self):
+        try:
+            temporary_path = host_topology.cache_path + "." + str(os.getpid())
+            with open(temporary_path, "w") as cache_file:
+                json.dump(self.info, cache_file, indent=4)
+            os.replace(temporary_path, host_topology.cache_path)
+        except OSError:
+            pass
+
+
+    @staticmethod
+    def discover():
+        info = {"key": host_topology.cache_key(), "cpus": {}, "nodes": {}, "memory-block-size": 0}
+        info["online-cpus"] = parse_cpu_list(read_sysfs(os.path.join(host_topology.cpu_directory, "online"), \
+                "0-" + str(os.cpu_count() - 1)))
+        info["present-cpus"] = parse_cpu_list(read_sysfs(os.path.join(host_topology.cpu_directory, "present"), \
+                "0-" + str(os.cpu_count() - 1)))
+        for cpu in info["online-cpus"]:
+            topology_directory = os.path.join(host_topology.cpu_directory, "cpu" + str(cpu), "topology")
+            info["cpus"][str(cpu)] = {
+                "socket": int(read_sysfs(os.path.join(topology_directory, "physical_package_id"), "0")),
+                "core": int(read_sysfs(os.path.join(topology_directory, "core_id"), str(cpu))),
+                "siblings": parse_cpu_list(read_sysfs(os.path.join(topology_directory, "thread_siblings_list"), \
+                                str(cpu)))}
+
+        # Hosts without NUMA support in sysfs are one node holding every CPU
+        node_names = []
+        if os.path.isdir(host_topology.node_directory):
+            node_names = [node for node in os.listdir(host_topology.node_directory) if re.fullmatch(r"node\d+", node)]
+        if len(node_names) == 0:
+            info["nodes"]["0"] = {"cpus": info["online-cpus"], "memory-kb": 0, "distances": [10], \
+                                  "has-cpu": True, "has-memory": True, "memory-blocks": []}
+        has_memory = parse_cpu_list(read_sysfs(os.path.join(host_topology.node_directory, "has_memory"), \
+                ",".join([node[len("node"):] for node in node_names])))
+        for node in node_names:
+            node_path = os.path.join(host_topology.node_directory, node)
+            memory_kb = 0
+            for line in read_sysfs(os.path.join(node_path, "meminfo")).split("\n"):
+                if "MemTotal:" in line:
+                    memory_kb = int(line.split()[-2])
+            cpus = parse_cpu_list(read_sysfs(os.path.join(node_path, "cpulist")))
+            info["nodes"][node[len("node"):]] = {"cpus": cpus, "memory-kb": memory_kb, \
+                    "distances": [int(distance) for distance in read_sysfs(os.path.join(node_path, "distance")).split()], \
+                    "has-cpu": len(cpus) > 0, "has-memory": int(node[len("node"):]) in has_memory, \
+                    "memory-blocks": sorted([int(entry[len("memory"):]) for entry in os.listdir(node_path) \
+                                                if re.fullmatch(r"memory\d+", entry)])}
+            for cpu in cpus:
+                if str(cpu) in info["cpus"]:
+                    info["cpus"][str(cpu)]["node"] = int(node[len("node"):])
+        block_size = read_sysfs(os.path.join(host_topology.memory_directory, "block_size_bytes"))
+        if block_size != "":
+            info["memory-block-size"] = int(block_size, 16)
+        return info
+
+
+    def nodes(self):
+        return sorted([int(node) for node in self.info["nodes"]])
+
+
+    def max_node(self):
+        return max(self.nodes())
+
+
+    def online_cpus(self):
+        return list(self.info["online-cpus"])
+
+
+    def present_cpus(self):
+        return list(self.info["present-cpus"])
+
+
+    def socket_count(self):
+        return len(set([self.info["cpus"][cpu]["socket"] for cpu in self.info["cpus"]]))
+
+
+    def node_cpus(self):
+        return {int(node): list(self.info["nodes"][node]["cpus"]) for node in self.info["nodes"]}
+
+
+    # Nodes with CPUs or with memory (memory-only nodes, e.g. CXL, have no CPUs)
+    def nodes_with(self, resource):
+        return [node for node in self.nodes() if self.info["nodes"][str(node)]["has-" + resource]]
+
+
+    def node_memory(self, node):
+        return self.info["nodes"][str(node)]["memory-kb"] * 1024
+
+
+    def distance(self, from_node, to_node):
+        return self.info["nodes"][str(from_node)]["distances"][self.nodes().index(to_node)]
+
+
+    # Online CPUs that share a core with a lower numbered CPU (the hyperthreads)
+    def smt_siblings(self):
+        return sorted([int(cpu) for cpu in self.info["cpus"] if int(cpu) != min(self.info["cpus"][cpu]["siblings"])])
+
+
+    def memory_blocks(self, node):
+        return list(self.info["nodes"][str(node)]["memory-blocks"])
+
+
+    def memory_block_size(self):
+        return self.info["memory-block-size"]
+
+
+
+_host = None
+
+
+# The host's topology, discovered at most once per process (and per boot across processes)
+def host_info(refresh=False):
+    global _host
+    if _host is None or refresh:
+        _host = host_topology.load(refresh)
+    return _host
@@ -3,86 +3,149 @@ import sys
 import string
 import argparse
 import re
-import numa
-
-
-
-def mem_capacity(target_node, target_capacity):
-    mem_dir='/sys/devices/system/memory'
-    memlist = [re.findall("\d+", mem)[0] for mem in os.listdir(mem_dir) \
-                if (os.path.isdir(os.path.join(mem_dir, mem)) and "memory" in mem)]
-
-    node_mems = {}
-    for numa_node in range(numa.info.get_max_node()+1):
-        node_mems["node" + str(numa_node)] = []
-
-    # Adds mem blocks to their respective dictionary list
-    for mem in memlist:
-        for in_mem_dir in os.listdir(mem_dir + "/memory" + mem):
-            online_status = True
-            with open(mem_dir + "/memory" + mem + "/online") as mem_status:
-                for line in mem_status:
-                    if online_status == "0":
-                        online_status = False
-            if "node" in in_mem_dir and online_status:
-                node_mems[in_mem_dir].append(mem)
-                break
-
-
-    # Offline as much as possible
-    original_node_mem = numa.memory.node_memory_info(int(target_node))[1] * 0.95
-    current_node_mem = numa.memory.node_memory_info(int(target_node))[1] * 0.95
-    if (current_node_mem/1000000000) > int(target_capacity):
-        for mem in node_mems["node" + str(target_node)]:
-            print("Offlining 'memory" + mem + "'...", end=" ")
-            os.system("sudo sh -c 'echo 0 > /sys/devices/system/memory/memory" + mem + "/online'")
-            print("Done!")
-            current_node_mem = numa.memory.node_memory_info(int(target_node))[1] * 0.95
-            if (current_node_mem/1000000000) < int(target_capacity):
-                print("Onlining 'memory" + mem + "'...", end=" ")
-                os.system("sudo sh -c 'echo 1 > /sys/devices/system/memory/memory" + mem + "/online'")
-                print("Done!")
-                current_node_mem = numa.memory.node_memory_info(int(target_node))[1] * 0.95
-                break
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+from topology import *
+
+
+
+mem_dir = "/sys/devices/system/memory"
+restore_manifest = "syscfg-restore.json"
+
+
+# Reads the online and removable state of a node's blocks (the topology knows which blocks it has)
+def mem_blocks(node):
+    topology = host_info()
+    blocks = {}
+    for block in topology.memory_blocks(node):
+        block_dir = os.path.join(mem_dir, "memory" + str(block))
+        blocks[block] = {"online": read_sysfs(os.path.join(block_dir, "online")) == "1", \
+                         "removable": read_sysfs(os.path.join(block_dir, "removable"), "1") == "1"}
+    return topology.memory_block_size(), blocks
+
+
+def block_online(block):
+    return read_sysfs(os.path.join(mem_dir, "memory" + str(block), "online")) == "1"
+
+
+# Writes a batch of blocks in one sudo call and returns the blocks that did not change state. The
+# writes stop at the first failing block, so the blocks after it are retried as the next batch
+def set_blocks(blocks, online):
+    failed_blocks = []
+    while len(blocks) > 0:
+        writes = " && ".join(["echo " + ("1" if online else "0") + " > " + \
+                              os.path.join(mem_dir, "memory" + str(block), "online") for block in blocks])
+        os.system("sudo sh -c '" + writes + "' 2> /dev/null")
+        unchanged_blocks = [block for block in blocks if block_online(block) != online]
+        if len(unchanged_blocks) == 0: break
+        failed_blocks.append(unchanged_blocks[0])
+        blocks = unchanged_blocks[1:]
+    return failed_blocks
+
+
+def write_restore_manifest(target_node, block_size, offlined_blocks):
+    manifest = {"block-size": block_size, "nodes": {}}
+    if os.path.exists(restore_manifest):
+        with open(restore_manifest) as manifest_file:
+            manifest = json.load(manifest_file)
+    node_blocks = set(manifest["nodes"].get(str(target_node), [])) | set(offlined_blocks)
+    manifest["nodes"][str(target_node)] = sorted(node_blocks)
+    with open(restore_manifest, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+
+
+def mem_restore():
+    if not os.path.exists(restore_manifest):
+        print("[WARNING] No restore manifest (" + restore_manifest + ") to restore memory from")
+        return
+    with open(restore_manifest) as manifest_file:
+        manifest = json.load(manifest_file)
+    failed_nodes = {}
+    for node in manifest["nodes"]:
+        print("Onlining " + str(len(manifest["nodes"][node])) + " memory blocks of node" + node + "...", end=" ")
+        failed_blocks = set_blocks(manifest["nodes"][node], True)
+        print("Done!" if len(failed_blocks) == 0 else str(len(failed_blocks)) + " failed")
+        if len(failed_blocks) > 0:
+            failed_nodes[node] = failed_blocks
+    if len(failed_nodes) == 0:
+        os.remove(restore_manifest)
     else:
-        print("[WARNING] Already below target node capacity (~" + current_node_mem/1000000000 + "GB)")
+        manifest["nodes"] = failed_nodes
+        with open(restore_manifest, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        print("[WARNING] Some blocks could not be onlined, they are kept in " + restore_manifest)
+
+
+# Plans the removable blocks to offline so the node stays at or just above the target capacity (GB),
+# offlines them in batches (replacing blocks that fail), and rolls everything back if it falls short
+def mem_capacity(target_node, target_capacity, batch_size=16):
+    target_node = int(target_node)
+    block_size, blocks = mem_blocks(target_node)
+    node_blocks = sorted([block for block in blocks if blocks[block]["online"]])
+    original_node_mem = len(node_blocks) * block_size
+    blocks_needed = int((original_node_mem - float(target_capacity) * 1000000000) // block_size)
+    if blocks_needed <= 0:
+        print("[WARNING] Already below target node capacity (~" + str(round(original_node_mem/1000000000)) + "GB)")
+        return
+
+    # Movable memory sits at the end of a node, so its highest blocks are the likeliest to offline
+    candidates = [block for block in reversed(node_blocks) if blocks[block]["removable"]]
+    if len(candidates) < blocks_needed:
+        print("[ERROR] Only " + str(len(candidates)) + " of the " + str(blocks_needed) + \
+                " blocks needed are removable on node" + str(target_node))
+        return
+
+    offlined_blocks = []
+    try:
+        while len(offlined_blocks) < blocks_needed and len(candidates) > 0:
+            batch = candidates[:min(batch_size, blocks_needed - len(offlined_blocks))]
+            candidates = candidates[len(batch):]
+            print("Offlining " + str(len(batch)) + " memory blocks...", end=" ")
+            failed_blocks = set_blocks(batch, False)
+            offlined_blocks += [block for block in batch if block not in failed_blocks]
+            print("Done!" if len(failed_blocks) == 0 else str(len(failed_blocks)) + " busy, trying others")
+    finally:
+        if len(offlined_blocks) < blocks_needed:
+            print("[ERROR] Could not reach the target capacity, only " + str(len(offlined_blocks)) + " of " + \
+                    str(blocks_needed) + " blocks went offline")
+            if len(offlined_blocks) > 0:
+                print("Onlining them again...", end=" ")
+                failed_blocks = set_blocks(offlined_blocks, True)
+                print("Done!" if len(failed_blocks) == 0 else str(len(failed_blocks)) + " failed")
+                offlined_blocks = failed_blocks
+        if len(offlined_blocks) > 0:
+            write_restore_manifest(target_node, block_size, offlined_blocks)
+    current_node_mem = original_node_mem - len(offlined_blocks) * block_size
 
     # Results
     print("===============================\n")
-    print("RAM on node" + target_node + " before: " + str(round(original_node_mem/1000000000)) + "GB")
-    print("RAM on node" + target_node + " after: " + str(round(current_node_mem/1000000000)) + "GB")
+    print("RAM on node" + str(target_node) + " before: " + str(round(original_node_mem/1000000000)) + "GB")
+    print("RAM on node" + str(target_node) + " after: " + str(round(current_node_mem/1000000000)) + "GB")
+    print("Restore with: python3 syscfg-adjust.py --restore")
     return
 
 
 
 def hyperthreading(disable):
-    cpu_dir = "/sys/devices/system/cpu"
-    cpu_list = sorted(list(filter(None, [re.findall("cpu[0-9]+"[3:], cpu) for cpu in os.listdir(cpu_dir)])))
-    num_cpus_before = os.cpu_count()
-    cpu_pairs = {}
+    topology = host_info()
+    num_cpus_before = len(topology.online_cpus())
 
     if disable:
-        # Gathering cpu list
-        for cpu in cpu_list:
-            with open(cpu_dir + "/cpu" + cpu[0] + "/topology/thread_siblings_list") as cpu_sibling:
-                for line in cpu_sibling:
-                    (real_cpu, ht_cpu) = line.strip().split(",")
-                    cpu_pairs[real_cpu] = ht_cpu
-
-        # Begin offlining
-        for cpu_pair in cpu_pairs:
-            print("Offlining 'cpu" + cpu_pairs[cpu_pair] + "'...", end=" ")
-            os.system("sudo sh -c 'echo 0 > /sys/devices/system/cpu/cpu" + cpu_pairs[cpu_pair] + "/online'")
+        # Every online CPU sharing a core with a lower numbered one
+        for ht_cpu in topology.smt_siblings():
+            print("Offlining 'cpu" + str(ht_cpu) + "'...", end=" ")
+            os.system("sudo sh -c 'echo 0 > /sys/devices/system/cpu/cpu" + str(ht_cpu) + "/online'")
             print("Done!")
     else:
         # Online all available cpus
-        for cpu in cpu_list:
-            print("Onlining 'cpu" + cpu[0] + "'...", end=" ")
-            os.system("sudo sh -c 'echo 1 > /sys/devices/system/cpu/cpu" + cpu[0] + "/online'")
+        for cpu in [cpu for cpu in topology.present_cpus() if cpu not in topology.online_cpus()]:
+            print("Onlining 'cpu" + str(cpu) + "'...", end=" ")
+            os.system("sudo sh -c 'echo 1 > /sys/devices/system/cpu/cpu" + str(cpu) + "/online'")
             print("Done!")
     print("")
 
-    num_cpus_after = os.cpu_count()
+    num_cpus_after = len(host_info(refresh=True).online_cpus())
     if (num_cpus_after == num_cpus_before):
         print("[WARNING] No change in the number of onlined CPUs!")
     print("Total number of onlined CPU's before: " + str(num_cpus_before))
@@ -96,20 +159,32 @@ def main():
     parser.add_argument("-m", "--offline_mem", help = \
             "Change system visible RAM capacity (default = false)", action='store_true')
     parser.add_argument("-c", "--capacity", help = \
-            "Desired memory capacity. This may go slightly above (+/-2GB) when not exact (default = 7GB)", default="7")
+            "Desired memory capacity in GB. The node is left at or up to one memory block above it (default = 7GB)", \
+            default="7")
     parser.add_argument("-n", "--node", help = \
             "Node to change memory size (default = 0)", default="0")
+    parser.add_argument("-b", "--batch", help = \
+            "Memory blocks offlined per sudo call (default = 16)", default="16")
+    parser.add_argument("-r", "--restore", help = \
+            "Online the memory blocks recorded in " + restore_manifest + " (default = false)", action='store_true')
     parser.add_argument("-H,", "--change_hyperthreading", help = \
             "Allow changes to current hyperthreading status (default = false)", action='store_true')
     parser.add_argument("-d", "--disable_hyperthreading", help = \
             "Offline visible hyperthreaded_cores (default = false)", action='store_true')
     args = parser.parse_args()
 
+    if args.restore:
+        mem_restore()
+
     if args.offline_mem:
-        mem_capacity(args.node, args.capacity)
+        mem_capacity(args.node, args.capacity, int(args.batch))
 
     if args.change_hyperthreading:
         hyperthreading(args.disable_hyperthreading)
+
+    # Node memory sizes changed, so the topology cached for the benchmarks is stale
+    if args.restore or args.offline_mem:
+        host_info(refresh=True)
     return
 
 
@@ -1,3 +0,0 @@
-#!/bin/bash
-
-pidstat --human -u -w -r -d -p $1 1 >pidstat.out
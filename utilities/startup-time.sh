@@ -0,0 +1,27 @@
+#!/bin/bash
+# Times main.py's startup (imports and argument parsing) from the repository root, and fails when the
+# average goes over the limit or numpy/matplotlib get imported before anything is processed or graphed
+# Usage: utilities/startup-time.sh [runs = 10] [limit in seconds = 0.5]
+cd "$(dirname "$0")/.."
+runs=${1:-10}
+limit=${2:-0.5}
+
+heavy=$(python3 -c "import sys; sys.argv = ['main.py']; sys.path.insert(0, 'scripts'); import main; \
+print(' '.join(sorted(set(module.split('.')[0] for module in sys.modules) & {'numpy', 'matplotlib', 'numa'})))")
+if [ -n "$heavy" ]; then
+    echo "[ERROR] Imported at startup: $heavy"
+    exit 1
+fi
+
+start=$(date +%s.%N)
+for run in $(seq "$runs"); do
+    python3 main.py --help > /dev/null
+done
+end=$(date +%s.%N)
+
+average=$(awk "BEGIN { printf \"%.3f\", ($end - $start) / $runs }")
+echo "Average startup time over $runs runs: ${average}s (limit ${limit}s)"
+if awk "BEGIN { exit !($average > $limit) }"; then
+    echo "[ERROR] Startup time is above the limit, see: python3 -X importtime main.py --help"
+    exit 1
+fi